@@ -1,21 +1,123 @@
 # app.py
 
-from flask import Flask, jsonify, request
-from milvus_interaction import save_to_milvus, search_in_milvus
+import json
+import os
+import threading
+import time
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+import jobs
+import metrics
+import partition_manager
+import query_log
+import resilience
+from milvus_interaction import (
+    COLLECTION_NAME, SEARCH_LIMIT, SEARCH_MAX_K, decode_cursor, prewarm, save_to_milvus, search_in_milvus,
+    stream_search_in_milvus
+)
 
 app = Flask(__name__)
 
+PREWARM_ON_STARTUP = os.environ.get('PREWARM_ON_STARTUP', 'true').lower() == 'true'
+PREWARM_TOP_N = int(os.environ.get('PREWARM_TOP_N', 50))
+
+# /ready reports 503 until the startup prewarm has finished
+readiness = {"ready": not PREWARM_ON_STARTUP, "prewarm": None}
+
+def run_prewarm():
+    try:
+        readiness["prewarm"] = prewarm(PREWARM_TOP_N)
+    except Exception as e:
+        readiness["prewarm"] = {"error": str(e)}
+    readiness["ready"] = True
+
+if PREWARM_ON_STARTUP:
+    threading.Thread(target=run_prewarm, name='prewarm', daemon=True).start()
+
 @app.route('/process_csv', methods=['POST'])
 def process_csv():
-    # Endpoint to process CSV and save to Milvus
-    response = save_to_milvus()
-    return jsonify(response)
+    # Endpoint to process CSV and save to Milvus; the work runs in the background
+    job = jobs.submit('process_csv', COLLECTION_NAME, save_to_milvus)
+    return jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}), 202
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({"jobs": jobs.list_jobs()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"message": f"Job '{job_id}' does not exist."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    # Cancellation takes effect at the next batch boundary
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"message": f"Job '{job_id}' does not exist."}), 404
+    return jsonify(job.to_dict()), 202
 
 @app.route('/search', methods=['GET'])
 def search():
-    search_term = request.args.get('q')
-    results = search_in_milvus(search_term)
+    cursor = request.args.get('cursor')
+    try:
+        if cursor:
+            # A cursor replaces q/k/offset/fan_out so the next page is consistent with the first
+            search_term, k, offset, full_fan_out, partitions, after = decode_cursor(cursor)
+        else:
+            search_term = request.args.get('q')
+            k = int(request.args.get('k', SEARCH_LIMIT))
+            offset = int(request.args.get('offset', 0))
+            # fan_out=all skips routing and searches every compatible collection
+            full_fan_out = request.args.get('fan_out') == 'all'
+            # partition=<value> (repeatable) limits the search to those partition key values
+            partitions = request.args.getlist('partition') or None
+            after = None
+        # Every search carries a deadline that bounds embedding and Milvus calls alike
+        timeout_ms = float(request.args.get('timeout_ms', resilience.SEARCH_DEADLINE_MS))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not search_term:
+        return jsonify({"error": "Missing search term 'q'."}), 400
+    if not 0 < k <= SEARCH_MAX_K or offset < 0:
+        return jsonify({"error": f"'k' must be between 1 and {SEARCH_MAX_K} and 'offset' must not be negative."}), 400
+    if not timeout_ms >= resilience.MIN_SEARCH_DEADLINE_MS:
+        return jsonify({"error": f"'timeout_ms' must be at least {resilience.MIN_SEARCH_DEADLINE_MS:g}."}), 400
+    deadline = resilience.Deadline(timeout_ms)
+
+    if request.args.get('stream') == 'ndjson':
+        def generate():
+            started = time.perf_counter()
+            searched = []
+            for record in stream_search_in_milvus(search_term, full_fan_out, k, offset, partitions, deadline, after):
+                if 'routing' in record:
+                    searched = record['routing']['searched']
+                yield json.dumps(record) + '\n'
+            query_log.record(search_term, searched, k, offset, partitions, full_fan_out,
+                             (time.perf_counter() - started) * 1000.0)
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    with metrics.timer('search.request_ms') as timer:
+        results = search_in_milvus(search_term, full_fan_out, k, offset, partitions, deadline, after)
+    searched = results.get('routing', {}).get('searched', [])
+    query_log.record(search_term, searched, k, offset, partitions, full_fan_out, timer.elapsed_ms)
     return jsonify(results)
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify(dict(metrics.snapshot(), breakers=resilience.breaker_states()))
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    return jsonify(readiness), 200 if readiness["ready"] else 503
+
+@app.route('/partitions', methods=['GET'])
+def get_partitions():
+    # Which partitions are loaded, their estimated size and the recent load/release events
+    return jsonify(partition_manager.residency())
+
 if __name__ == '__main__':
     app.run(debug=True)
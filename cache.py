@@ -0,0 +1,47 @@
+# cache.py
+#
+# Small thread-safe LRU cache with an optional time-to-live, used for query
+# embeddings and search results.
+
+import collections
+import threading
+import time
+
+import metrics
+
+
+class LRUCache:
+    def __init__(self, name, maxsize, ttl=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    # allow_stale returns an expired entry too; used as a fallback when the live path is failing
+    def get(self, key, allow_stale=False):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (allow_stale or self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                metrics.increment(f'cache.{self.name}.hit')
+                return entry[1]
+        metrics.increment(f'cache.{self.name}.miss')
+        return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
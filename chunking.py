@@ -0,0 +1,170 @@
+# chunking.py
+#
+# Streams source files (csv, xlsx, markdown, plain text) as records and splits
+# each record into token-bounded, overlapping chunks ready to be embedded.
+
+import csv
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+CHUNK_MAX_TOKENS = int(os.environ.get('CHUNK_MAX_TOKENS', 512))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get('CHUNK_OVERLAP_TOKENS', 64))
+# Plain text is buffered up to roughly this many characters before being chunked
+TEXT_BUFFER_CHARS = 64 * 1024
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('cl100k_base')
+except ImportError:
+    # Without tiktoken fall back to whitespace-delimited words, which over-counts slightly
+    _encoding = None
+
+_WORD_RE = re.compile(r'\S+\s*')
+_HEADING_RE = re.compile(r'^#{1,6}\s')
+
+
+def _tokenize(text):
+    if _encoding is not None:
+        return _encoding.encode(text)
+    return _WORD_RE.findall(text)
+
+
+def _detokenize(tokens):
+    if _encoding is not None:
+        return _encoding.decode(tokens)
+    return ''.join(tokens)
+
+
+def count_tokens(text):
+    return len(_tokenize(text))
+
+
+# Split text into windows of at most max_tokens, each sharing `overlap` tokens with the previous one
+def chunk_text(text, max_tokens=CHUNK_MAX_TOKENS, overlap=CHUNK_OVERLAP_TOKENS):
+    if overlap >= max_tokens:
+        raise ValueError("Chunk overlap must be smaller than the chunk size.")
+    tokens = _tokenize(text)
+    if not tokens:
+        return
+    step = max_tokens - overlap
+    for start in range(0, len(tokens), step):
+        chunk = _detokenize(tokens[start:start + max_tokens]).strip()
+        if chunk:
+            yield chunk
+        if start + max_tokens >= len(tokens):
+            break
+
+
+# Each row becomes one record; the text keeps the column names so nothing is lost when embedded
+def iter_csv_records(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row_number, row in enumerate(csv.DictReader(f)):
+            text = '\n'.join(f"{key}: {value}" for key, value in row.items() if value)
+            yield text, {'row': row_number, 'fields': row}
+
+
+def iter_xlsx_records(path):
+    # openpyxl is only needed when spreadsheets are ingested
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                continue
+            header = [str(name) if name is not None else f'column_{i}' for i, name in enumerate(header)]
+            for row_number, values in enumerate(rows):
+                row = {name: value for name, value in zip(header, values) if value is not None}
+                if not row:
+                    continue
+                text = '\n'.join(f"{key}: {value}" for key, value in row.items())
+                yield text, {'sheet': sheet.title, 'row': row_number, 'fields': {k: str(v) for k, v in row.items()}}
+    finally:
+        workbook.close()
+
+
+# One record per heading section; sections larger than the buffer are flushed early
+def iter_markdown_records(path):
+    with open(path, encoding='utf-8') as f:
+        heading = None
+        lines = []
+        size = 0
+        for line in f:
+            if _HEADING_RE.match(line) or size > TEXT_BUFFER_CHARS:
+                if lines:
+                    yield ''.join(lines), {'heading': heading}
+                if _HEADING_RE.match(line):
+                    heading = line.strip('# \n')
+                lines, size = [], 0
+            lines.append(line)
+            size += len(line)
+        if lines:
+            yield ''.join(lines), {'heading': heading}
+
+
+# Paragraphs are packed together until the buffer fills, so huge files are never read whole
+def iter_text_records(path):
+    with open(path, encoding='utf-8') as f:
+        lines = []
+        size = 0
+        for line in f:
+            lines.append(line)
+            size += len(line)
+            # Prefer to break on a blank line, but never let a single buffer grow unbounded
+            if size > TEXT_BUFFER_CHARS and (not line.strip() or size > 4 * TEXT_BUFFER_CHARS):
+                yield ''.join(lines), {}
+                lines, size = [], 0
+        if lines:
+            yield ''.join(lines), {}
+
+
+def iter_records(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return iter_csv_records(path)
+    if extension in ('.xlsx', '.xlsm'):
+        return iter_xlsx_records(path)
+    if extension in ('.md', '.markdown'):
+        return iter_markdown_records(path)
+    return iter_text_records(path)
+
+
+# Number of records in a file without parsing or tokenizing them, for progress estimates.
+# Returns None when it cannot be known cheaply (markdown and plain text are split as they stream).
+def count_records(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            return max(0, sum(1 for _ in csv.reader(f)) - 1)
+    if extension in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+
+        # Read-only workbooks report their dimensions without loading any cells
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = [sheet.max_row for sheet in workbook.worksheets]
+        finally:
+            workbook.close()
+        if any(count is None for count in rows):
+            return None
+        return sum(max(0, count - 1) for count in rows)
+    return None
+
+
+# Yield (chunk text, metadata) for every chunk of every record in the file. The row itself is
+# already in the chunk text, so only the columns named in keep_fields (e.g. the partition key)
+# are carried in the metadata.
+def iter_chunks(path, max_tokens=CHUNK_MAX_TOKENS, overlap=CHUNK_OVERLAP_TOKENS, keep_fields=()):
+    source = os.path.basename(path)
+    for record_number, (text, metadata) in enumerate(iter_records(path)):
+        row = metadata.pop('fields', {})
+        kept = {key: row[key] for key in keep_fields if key in row}
+        if kept:
+            metadata['fields'] = kept
+        for chunk_index, chunk in enumerate(chunk_text(text, max_tokens, overlap)):
+            yield chunk, dict(metadata, source=source, record=record_number, chunk_index=chunk_index)
@@ -0,0 +1,191 @@
+# collection_router.py
+#
+# Keeps a compact summary of every collection (a small k-means codebook of its
+# embeddings plus the embedding model and dimension) so a query only has to be
+# searched in the collections whose centroids are close to it.
+
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PATH = os.environ.get('COLLECTION_SUMMARY_PATH', 'collection_summaries.json')
+CODEBOOK_SIZE = int(os.environ.get('ROUTER_CODEBOOK_SIZE', 16))
+ROUTER_THRESHOLD = float(os.environ.get('ROUTER_THRESHOLD', 0.75))
+ROUTER_MAX_COLLECTIONS = int(os.environ.get('ROUTER_MAX_COLLECTIONS', 3))
+# Collections ingested before routing existed have no summary; by default they are still searched
+ROUTER_SKIP_UNSUMMARIZED = os.environ.get('ROUTER_SKIP_UNSUMMARIZED', 'false').lower() == 'true'
+KMEANS_ITERATIONS = 25
+
+_lock = threading.Lock()
+# Parsed summaries with their centroids as arrays, reused until the file changes on disk
+_cache = {'stamp': None, 'summaries': {}}
+_cache_lock = threading.Lock()
+
+
+def load_summaries():
+    if not os.path.exists(SUMMARY_PATH):
+        return {}
+    with open(SUMMARY_PATH) as f:
+        return json.load(f)
+
+
+# Summaries for scoring; the file is only re-read when its path, mtime or size changes,
+# e.g. after another process (main.py, snapshot.py) has rewritten it
+def _cached_summaries():
+    try:
+        stat = os.stat(SUMMARY_PATH)
+        stamp = (SUMMARY_PATH, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        stamp = None
+    with _cache_lock:
+        if stamp != _cache['stamp']:
+            summaries = load_summaries() if stamp is not None else {}
+            for summary in summaries.values():
+                summary['centroids'] = np.asarray(summary['centroids'], dtype=np.float32)
+            _cache['stamp'] = stamp
+            _cache['summaries'] = summaries
+        return _cache['summaries']
+
+
+def _write_summaries(summaries):
+    tmp_path = SUMMARY_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(summaries, f)
+    os.replace(tmp_path, SUMMARY_PATH)
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# Weighted spherical k-means; weights let an existing codebook be merged with new vectors
+def _kmeans(vectors, weights, k):
+    k = min(k, len(vectors))
+    rng = np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False, p=weights / weights.sum())]
+    assignment = np.zeros(len(vectors), dtype=np.int64)
+    for iteration in range(KMEANS_ITERATIONS):
+        new_assignment = np.argmax(vectors @ centroids.T, axis=1)
+        if iteration > 0 and np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+        for c in range(k):
+            members = assignment == c
+            if members.any():
+                centroids[c] = (vectors[members] * weights[members, None]).sum(axis=0)
+        centroids = _normalize(centroids)
+    sizes = np.bincount(assignment, weights=weights, minlength=k)
+    keep = sizes > 0
+    return centroids[keep], sizes[keep]
+
+
+# Fold newly ingested embeddings into the stored summary for a collection
+def update_summary(collection_name, embeddings, model, dimension):
+    if not embeddings:
+        return
+    vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+    weights = np.ones(len(vectors), dtype=np.float64)
+
+    with _lock:
+        summaries = load_summaries()
+        existing = summaries.get(collection_name)
+        if existing and existing['model'] == model and existing['dimension'] == dimension:
+            vectors = np.vstack([np.asarray(existing['centroids'], dtype=np.float32), vectors])
+            weights = np.concatenate([np.asarray(existing['sizes'], dtype=np.float64), weights])
+
+        centroids, sizes = _kmeans(vectors, weights, CODEBOOK_SIZE)
+        summaries[collection_name] = {
+            'model': model,
+            'dimension': dimension,
+            'count': int(weights.sum()),
+            'centroids': centroids.round(6).tolist(),
+            'sizes': sizes.tolist(),
+        }
+        _write_summaries(summaries)
+    logger.info(f"Updated routing summary for '{collection_name}' ({len(centroids)} centroids).")
+
+
+# Install a summary as-is, e.g. one carried inside a collection snapshot
+def set_summary(collection_name, summary):
+    with _lock:
+        summaries = load_summaries()
+        summaries[collection_name] = summary
+        _write_summaries(summaries)
+
+
+def drop_summary(collection_name):
+    with _lock:
+        summaries = load_summaries()
+        if summaries.pop(collection_name, None) is not None:
+            _write_summaries(summaries)
+
+
+# Score every candidate collection against the query embedding.
+# Collections without a summary cannot be ruled out, so they get a score of None.
+def score_collections(query_embedding, collection_names, model, dimension):
+    summaries = _cached_summaries()
+    query = _normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+    scores = {}
+    for name in collection_names:
+        summary = summaries.get(name)
+        if summary is None:
+            scores[name] = None
+        elif summary['model'] != model or summary['dimension'] != dimension:
+            # A query embedded with a different model is meaningless in this collection
+            continue
+        else:
+            scores[name] = float(np.max(summary['centroids'] @ query))
+    return scores
+
+
+# Pick the collections worth searching. With full_fan_out every compatible collection is returned.
+# Collections that are skipped are counted as the work saved by routing.
+def route(query_embedding, collection_names, model, dimension,
+          threshold=ROUTER_THRESHOLD, max_collections=ROUTER_MAX_COLLECTIONS, full_fan_out=False):
+    scores = score_collections(query_embedding, collection_names, model, dimension)
+    if full_fan_out:
+        selected = list(scores)
+    else:
+        unknown = [] if ROUTER_SKIP_UNSUMMARIZED else [name for name, score in scores.items() if score is None]
+        ranked = sorted(((score, name) for name, score in scores.items() if score is not None), reverse=True)
+        passing = [name for score, name in ranked if score >= threshold][:max_collections]
+        if not passing and ranked:
+            # Score scales differ between embedding models; rather than search nothing, keep the best match
+            passing = [ranked[0][1]]
+            metrics.increment('router.below_threshold')
+        selected = unknown + passing
+
+    skipped = len(collection_names) - len(selected)
+    metrics.increment('router.queries')
+    metrics.increment('router.collections_considered', len(collection_names))
+    metrics.increment('router.collections_searched', len(selected))
+    metrics.increment('router.collections_skipped', skipped)
+    logger.info(f"Routed query to {selected} (skipped {skipped} of {len(collection_names)}).")
+    return selected, scores
+
+
+# Compare a routing decision against a full fan-out: which collections held the best hits?
+def record_precision(routed, results_per_collection, k):
+    hits = []
+    for collection_name, results in results_per_collection.items():
+        for rows in results.values():
+            hits.extend((row[1], collection_name) for row in rows)
+    # L2 distance: smaller is better
+    relevant = {name for _, name in sorted(hits)[:k]}
+    if not routed or not relevant:
+        return None
+    routed = set(routed)
+    precision = len(routed & relevant) / len(routed)
+    recall = len(routed & relevant) / len(relevant)
+    metrics.observe('router.precision', precision)
+    metrics.observe('router.recall', recall)
+    return precision
@@ -0,0 +1,194 @@
+# doc_store.py
+#
+# Local SQLite store for chunk text. Milvus only keeps chunk ids, vectors and
+# filter fields; the (zlib-compressed) text and metadata live here and are
+# fetched in bulk for the hits of a search. A contentless FTS5 index over the
+# same text backs the lexical fallback used when vector search is unavailable.
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+DOC_STORE_PATH = os.environ.get('DOC_STORE_PATH', 'doc_store.sqlite3')
+# SQLite's default limit on bound parameters is 999
+_MAX_PARAMS = 900
+_TERM_RE = re.compile(r'\w+')
+
+# Some SQLite builds lack FTS5; the lexical fallback is then simply unavailable
+_fts_available = True
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _create_schema(conn):
+    global _fts_available
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS chunks ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+        ' collection TEXT NOT NULL,'
+        ' source TEXT NOT NULL,'
+        ' body BLOB NOT NULL,'
+        ' metadata TEXT NOT NULL)'
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS chunks_collection_source ON chunks (collection, source)')
+    try:
+        # Contentless: only the inverted index is stored, the text itself stays compressed in `chunks`
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(body, content='')")
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 is not available, lexical fallback disabled. Error: {str(e)}")
+        _fts_available = False
+
+
+# One connection per thread and store path, kept open for reuse; the schema is created the
+# first time a path is opened in this process
+def _connect():
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(DOC_STORE_PATH)
+    if conn is None:
+        conn = sqlite3.connect(DOC_STORE_PATH, timeout=30)
+        with _schema_lock:
+            if DOC_STORE_PATH not in _schema_ready:
+                _create_schema(conn)
+                conn.commit()
+                _schema_ready.add(DOC_STORE_PATH)
+        connections[DOC_STORE_PATH] = conn
+    return conn
+
+
+def _index_text(conn, chunk_id, text):
+    if _fts_available:
+        conn.execute('INSERT INTO chunks_fts (rowid, body) VALUES (?, ?)', (chunk_id, text))
+
+
+# A contentless FTS5 table needs the original text to remove a row from the index
+def _unindex_rows(conn, rows):
+    if _fts_available:
+        for chunk_id, body in rows:
+            conn.execute(
+                "INSERT INTO chunks_fts (chunks_fts, rowid, body) VALUES ('delete', ?, ?)",
+                (chunk_id, zlib.decompress(body).decode('utf-8')),
+            )
+
+
+# Store a batch of (text, metadata) chunks in one transaction and return their new ids
+def put_chunks(collection_name, chunks):
+    ids = []
+    conn = _connect()
+    with conn:
+        for text, metadata in chunks:
+            cursor = conn.execute(
+                'INSERT INTO chunks (collection, source, body, metadata) VALUES (?, ?, ?, ?)',
+                (
+                    collection_name,
+                    metadata.get('source', ''),
+                    zlib.compress(text.encode('utf-8')),
+                    json.dumps(metadata, default=str),
+                ),
+            )
+            _index_text(conn, cursor.lastrowid, text)
+            ids.append(cursor.lastrowid)
+    return ids
+
+
+# Fetch chunks by id in bulk; ids missing from the store are simply absent from the result
+def get_chunks(collection_name, ids):
+    found = {}
+    ids = list(ids)
+    conn = _connect()
+    for start in range(0, len(ids), _MAX_PARAMS):
+        batch = ids[start:start + _MAX_PARAMS]
+        placeholders = ','.join('?' * len(batch))
+        rows = conn.execute(
+            f'SELECT id, body, metadata FROM chunks WHERE collection = ? AND id IN ({placeholders})',
+            [collection_name] + batch,
+        )
+        for chunk_id, body, metadata in rows:
+            found[chunk_id] = {
+                'text': zlib.decompress(body).decode('utf-8'),
+                'metadata': json.loads(metadata),
+            }
+    return found
+
+
+# Rank a collection's chunks against the query terms with BM25; returns (id, score, text) best first
+def search_text(collection_name, query, limit):
+    terms = _TERM_RE.findall(query.lower())
+    if not _fts_available or not terms:
+        return []
+    match = ' OR '.join(f'"{term}"' for term in terms)
+    conn = _connect()
+    rows = conn.execute(
+        'SELECT c.id, bm25(chunks_fts), c.body FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid'
+        ' WHERE chunks_fts MATCH ? AND c.collection = ? ORDER BY bm25(chunks_fts) LIMIT ?',
+        (match, collection_name, limit),
+    ).fetchall()
+    # bm25() is lower-is-better, like the L2 distances returned by vector search
+    return [(chunk_id, score, zlib.decompress(body).decode('utf-8')) for chunk_id, score, body in rows]
+
+
+def delete_chunks(collection_name, ids):
+    ids = list(ids)
+    conn = _connect()
+    with conn:
+        for start in range(0, len(ids), _MAX_PARAMS):
+            batch = ids[start:start + _MAX_PARAMS]
+            placeholders = ','.join('?' * len(batch))
+            params = [collection_name] + batch
+            _unindex_rows(conn, conn.execute(
+                f'SELECT id, body FROM chunks WHERE collection = ? AND id IN ({placeholders})', params
+            ).fetchall())
+            conn.execute(f'DELETE FROM chunks WHERE collection = ? AND id IN ({placeholders})', params)
+
+
+def delete_collection(collection_name):
+    conn = _connect()
+    with conn:
+        _unindex_rows(conn, conn.execute(
+            'SELECT id, body FROM chunks WHERE collection = ?', (collection_name,)
+        ).fetchall())
+        conn.execute('DELETE FROM chunks WHERE collection = ?', (collection_name,))
+
+
+# Reserve a block of `span` unused ids and return the first one. Imported chunks are written
+# into the block, so they never collide with chunks of other collections.
+def reserve_ids(span):
+    conn = _connect()
+    try:
+        # IMMEDIATE takes the write lock up front so concurrent reservations cannot overlap
+        conn.execute('BEGIN IMMEDIATE')
+        max_id = conn.execute('SELECT MAX(id) FROM chunks').fetchone()[0] or 0
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'chunks'").fetchone()
+        first = max(max_id, sequence[0] if sequence else 0) + 1
+        # AUTOINCREMENT continues after the block, so put_chunks will not hand these ids out either
+        if sequence:
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'chunks'", (first + span - 1,))
+        else:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('chunks', ?)", (first + span - 1,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return first
+
+
+# Insert chunks under ids from a block returned by reserve_ids, e.g. when a collection snapshot
+# is imported. rows are (id, source, text, metadata json) tuples.
+def restore_chunks(collection_name, rows):
+    conn = _connect()
+    with conn:
+        for chunk_id, source, text, metadata in rows:
+            conn.execute(
+                'INSERT INTO chunks (id, collection, source, body, metadata) VALUES (?, ?, ?, ?, ?)',
+                (chunk_id, collection_name, source, zlib.compress(text.encode('utf-8')), metadata),
+            )
+            _index_text(conn, chunk_id, text)
@@ -0,0 +1,191 @@
+# jobs.py
+#
+# Background ingestion jobs. Work is submitted to a bounded worker pool and
+# returns a job id straight away; jobs for the same collection run one at a
+# time, report progress (rows read/embedded/inserted, throughput, ETA, errors)
+# and can be cancelled between batches.
+
+import collections
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 2))
+# Finished jobs kept around so their final status can still be fetched
+MAX_FINISHED_JOBS = int(os.environ.get('MAX_FINISHED_JOBS', 100))
+MAX_JOB_ERRORS = 50
+
+_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix='ingest')
+_lock = threading.Lock()
+_jobs = collections.OrderedDict()
+# Jobs waiting for an earlier job on the same collection; only the head of a queue is in the pool
+_pending = collections.defaultdict(collections.deque)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, collection_name):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.collection = collection_name
+        self.status = 'queued'
+        self.rows_total = None
+        self.rows_read = 0
+        self.rows_embedded = 0
+        self.rows_inserted = 0
+        self.errors = []
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, read=0, embedded=0, inserted=0):
+        with self._lock:
+            self.rows_read += read
+            self.rows_embedded += embedded
+            self.rows_inserted += inserted
+
+    def error(self, message):
+        logger.error(f"Job {self.id}: {message}")
+        with self._lock:
+            if len(self.errors) < MAX_JOB_ERRORS:
+                self.errors.append(message)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    # Called between batches; stops the job at a clean boundary
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    # Rate-limit pause that returns early when the job is cancelled
+    def sleep(self, seconds):
+        self._cancelled.wait(seconds)
+        self.check_cancelled()
+
+    def to_dict(self):
+        with self._lock:
+            elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+            throughput = self.rows_read / elapsed if elapsed > 0 else None
+            eta = None
+            if self.status == 'running' and self.rows_total and throughput:
+                eta = max(0.0, (self.rows_total - self.rows_read) / throughput)
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'collection': self.collection,
+                'status': self.status,
+                'rows_total': self.rows_total,
+                'rows_read': self.rows_read,
+                'rows_embedded': self.rows_embedded,
+                'rows_inserted': self.rows_inserted,
+                'rows_per_second': round(throughput, 2) if throughput else None,
+                'eta_seconds': round(eta, 1) if eta is not None else None,
+                'elapsed_seconds': round(elapsed, 1),
+                'errors': list(self.errors),
+                'result': self.result,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+def _run(job, fn):
+    try:
+        if job._cancelled.is_set():
+            job.status = 'cancelled'
+            job.finished_at = job.finished_at or time.time()
+            return
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = fn(job)
+            job.status = 'succeeded'
+        except JobCancelled:
+            job.status = 'cancelled'
+            logger.info(f"Job {job.id} cancelled after {job.rows_read} rows.")
+        except Exception as e:
+            job.status = 'failed'
+            job.error(str(e))
+        finally:
+            job.finished_at = time.time()
+            metrics.increment(f'jobs.{job.status}')
+            metrics.observe('jobs.duration_s', job.finished_at - job.started_at)
+    finally:
+        _start_next(job.collection)
+
+
+# One ingestion per collection at a time: the next job for a collection is handed to the pool
+# only when the previous one finishes, so workers never sit waiting and other collections
+# proceed in parallel
+def _start_next(collection_name):
+    with _lock:
+        queue = _pending[collection_name]
+        queue.popleft()
+        if not queue:
+            del _pending[collection_name]
+            return
+        job, fn = queue[0]
+    _pool.submit(_run, job, fn)
+
+
+def _forget_old_jobs():
+    finished = [job_id for job_id, job in _jobs.items() if job.finished_at is not None]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job_id]
+
+
+# Queue fn(job) for a collection and return the Job immediately
+def submit(kind, collection_name, fn):
+    job = Job(kind, collection_name)
+    with _lock:
+        _forget_old_jobs()
+        _jobs[job.id] = job
+        queue = _pending[collection_name]
+        queue.append((job, fn))
+        start_now = len(queue) == 1
+    metrics.increment('jobs.submitted')
+    if start_now:
+        _pool.submit(_run, job, fn)
+    logger.info(f"Submitted {kind} job {job.id} for collection '{collection_name}'.")
+    return job
+
+
+def get(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs():
+    with _lock:
+        return [job.to_dict() for job in _jobs.values()]
+
+
+def cancel(job_id):
+    job = get(job_id)
+    if job is None:
+        return None
+    job.cancel()
+    with _lock:
+        if job.status == 'queued':
+            # A queued job is cancelled right away; one waiting behind another job leaves the queue,
+            # one already handed to the pool is skipped by _run
+            job.status = 'cancelled'
+            job.finished_at = time.time()
+            queue = _pending.get(job.collection)
+            if queue and queue[0][0] is not job:
+                queue.remove(next(item for item in queue if item[0] is job))
+    return job
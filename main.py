@@ -1,6 +1,5 @@
 import csv
 import json
-import random
 import openai
 import time
 from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
@@ -8,6 +7,12 @@ import logging
 import colorlog
 import os
 from dotenv import load_dotenv
+
+import chunking
+import collection_router
+import doc_store
+import partition_manager
+import schema_inference
 load_dotenv()
 # Set up the logger
 logger = logging.getLogger(__name__)
@@ -32,13 +37,6 @@ console_handler.setFormatter(formatter)
 # Add the console handler to the logger
 logger.addHandler(console_handler)
 
-# Extract the book titles
-def csv_load(file):
-    with open(file, newline='') as f:
-        reader = csv.reader(f, delimiter=',')
-        for row in reader:
-            yield row
-
 # Embed text with error handling
 def embed_with_error_handling(text):
     try:
@@ -53,7 +51,7 @@ def embed_with_error_handling(text):
 # Set up variables
 FILE = 'csv/Questions Master _ ChildOther.csv'
 COLLECTION_NAME = 'title_db'
-DIMENSION = 1536
+DIMENSION = schema_inference.embedding_dimension(os.environ.get('OPENAI_ENGINE'))
 with open(FILE, newline='') as f:
     row_count = sum(1 for row in csv.reader(f))
 # Use the minimum of row_count and a specified maximum count
@@ -76,12 +74,14 @@ logger.info("Connected to Milvus.")
 # Remove collection if it already exists
 if utility.has_collection(COLLECTION_NAME):
     utility.drop_collection(COLLECTION_NAME)
+    collection_router.drop_summary(COLLECTION_NAME)
+    doc_store.delete_collection(COLLECTION_NAME)
     logger.info(f"Collection '{COLLECTION_NAME}' already exists. Dropped the existing collection.")
 
 # Create collection schema
 fields = [
-    FieldSchema(name='id', dtype=DataType.INT64, description='Ids', is_primary=True, auto_id=False),
-    FieldSchema(name='title', dtype=DataType.VARCHAR, description='Title texts', max_length=1200),
+    FieldSchema(name='id', dtype=DataType.INT64, description='Chunk ids in the document store', is_primary=True, auto_id=False),
+    FieldSchema(name='source', dtype=DataType.VARCHAR, description='Source file name', max_length=256),
     FieldSchema(name='embedding', dtype=DataType.FLOAT_VECTOR, description='Embedding vectors', dim=DIMENSION)
 ]
 schema = CollectionSchema(fields=fields, description='Title collection')
@@ -97,24 +97,38 @@ index_params = {
 collection.create_index(field_name="embedding", index_params=index_params)
 logger.info("Created index for the collection.")
 
-# Insert each title and its embedding with error handling
-for idx, text in enumerate(random.sample(sorted(csv_load(FILE)), k=COUNT)):
-    logger.debug(f"Inserting text '{text[4]}' with index '{idx}'.")
-    embedding = embed_with_error_handling(text[0])
-    if embedding is not None:
-        
-        ins = [{'id': idx, 'title': str(text), 'embedding': embedding}]
+# Insert each chunk and its embedding with error handling.
+# The chunk text goes to the document store; Milvus only keeps the id, source and vector.
+# Embeddings are folded into the routing summary every SUMMARY_BATCH_SIZE chunks, so memory stays bounded.
+SUMMARY_BATCH_SIZE = 64
+pending_embeddings = []
+for text, metadata in chunking.iter_chunks(FILE, keep_fields=(partition_manager.PARTITION_KEY,)):
+    logger.debug(f"Inserting chunk {metadata['chunk_index']} of record {metadata['record']}.")
+    embedding = embed_with_error_handling(text)
+    if embedding is None:
+        continue
+    [chunk_id] = doc_store.put_chunks(COLLECTION_NAME, [(text, metadata)])
     try:
-        collection.insert(ins)
-        logger.debug(f"Text '{text[5]}' inserted successfully.")
+        # Rows go to their key's partition so searches only load the partitions they need
+        partition_name = partition_manager.partition_for_metadata(metadata)
+        partition_manager.ensure_partition(collection, partition_name)
+        collection.insert([{'id': chunk_id, 'source': metadata['source'], 'embedding': embedding}],
+                          partition_name=partition_name)
+        pending_embeddings.append(embedding)
+        if len(pending_embeddings) == SUMMARY_BATCH_SIZE:
+            collection_router.update_summary(COLLECTION_NAME, pending_embeddings, OPENAI_ENGINE, DIMENSION)
+            pending_embeddings = []
+        logger.debug(f"Chunk '{chunk_id}' inserted successfully.")
         time.sleep(3)  # Free OpenAI account limited to 60 RPM
     except Exception as e:
-        logger.error(f"Error inserting text '{text[0]}' into collection. Error: {str(e)}")
+        doc_store.delete_chunks(COLLECTION_NAME, [chunk_id])
+        logger.error(f"Error inserting chunk '{chunk_id}' into collection. Error: {str(e)}")
+
 
+# Partitions are loaded on demand, within the memory budget, when they are first searched
 
-# Load the collection into memory for searching
-collection.load()
-logger.info("Loaded collection into memory for searching.")
+# Summarise the rest of the collection so /search can route queries to it
+collection_router.update_summary(COLLECTION_NAME, pending_embeddings, OPENAI_ENGINE, DIMENSION)
 
 # Search text with error handling
 def search_with_error_handling(text):
@@ -123,16 +137,19 @@ def search_with_error_handling(text):
         embedded_text = embed_with_error_handling(text)
         if embedded_text:
             search_params = {"metric_type": "L2"}
-            results = collection.search(
-                data=[embedded_text],
-                anns_field="embedding",
-                param=search_params,
-                limit=1,
-                output_fields=['title']
-            )
+            partition_names = partition_manager.resolve_partitions(collection)
+            with partition_manager.loaded(collection, partition_names):
+                results = collection.search(
+                    data=[embedded_text],
+                    anns_field="embedding",
+                    param=search_params,
+                    limit=1,
+                    partition_names=partition_names
+                )
+            chunks = doc_store.get_chunks(COLLECTION_NAME, [hit.id for hit in results[0]])
             ret = []
             for hit in results[0]:
-                row = [hit.id, hit.score, hit.entity.get('title')]
+                row = [hit.id, hit.score, chunks.get(hit.id, {}).get('text')]
                 ret.append(row)
             return ret
         else:
@@ -0,0 +1,82 @@
+# metrics.py
+#
+# In-process counters and latency samples, exposed by the Flask app on /metrics.
+
+import os
+import threading
+import time
+
+# Keep only the most recent samples per series so memory stays bounded
+MAX_SAMPLES = int(os.environ.get('METRICS_MAX_SAMPLES', 2048))
+
+_lock = threading.Lock()
+_counters = {}
+_samples = {}
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, value):
+    with _lock:
+        series = _samples.setdefault(name, [])
+        series.append(value)
+        if len(series) > MAX_SAMPLES:
+            del series[:len(series) - MAX_SAMPLES]
+
+
+def percentile(name, pct):
+    with _lock:
+        series = sorted(_samples.get(name, []))
+    if not series:
+        return None
+    index = min(len(series) - 1, int(round(pct / 100.0 * (len(series) - 1))))
+    return series[index]
+
+
+def get_counter(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+# Time a block of code and record the elapsed milliseconds under `name`
+class timer:
+    def __init__(self, name):
+        self.name = name
+        self.elapsed_ms = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed_ms = (time.perf_counter() - self.start) * 1000.0
+        observe(self.name, self.elapsed_ms)
+        return False
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        samples = {name: sorted(values) for name, values in _samples.items()}
+
+    summaries = {}
+    for name, values in samples.items():
+        if not values:
+            continue
+        summaries[name] = {
+            'count': len(values),
+            'mean': sum(values) / len(values),
+            'p50': values[int(0.50 * (len(values) - 1))],
+            'p95': values[int(0.95 * (len(values) - 1))],
+            'p99': values[int(0.99 * (len(values) - 1))],
+            'max': values[-1],
+        }
+    return {'counters': counters, 'samples': summaries}
+
+
+def sample_count(name):
+    with _lock:
+        return len(_samples.get(name, []))
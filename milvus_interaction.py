@@ -1,7 +1,8 @@
-from flask import Flask, request, jsonify
-import csv
+from flask import Flask, request
 import random
 import os
+import base64
+import json
 import openai
 from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
 import logging
@@ -9,6 +10,17 @@ import colorlog
 from dotenv import load_dotenv
 import time
 
+import cache
+import chunking
+import collection_router
+import doc_store
+import jobs
+import metrics
+import partition_manager
+import query_log
+import resilience
+import schema_inference
+
 # Load environment variables or set them directly
 MILVUS_HOST = os.environ.get('MILVUS_HOST')
 MILVUS_PORT = os.environ.get('MILVUS_PORT')
@@ -43,31 +55,125 @@ MILVUS_PORT = MILVUS_PORT
 OPENAI_ENGINE = OPENAI_ENGINE
 openai.api_key = OPENAI_API_KEY
 
-# Extract the book titles
-def csv_load(file):
-    with open(file, newline='') as f:
-        reader = csv.reader(f, delimiter=',')
-        for row in reader:
-            yield row[1]
-# Embed text with error handling
-def embed_with_error_handling(text):
+DIMENSION = schema_inference.embedding_dimension(OPENAI_ENGINE)
+# Fraction of routed searches that are also fanned out to every collection to measure routing precision;
+# 0 turns the audit (and the router.precision/recall metrics) off
+ROUTER_AUDIT_RATE = float(os.environ.get('ROUTER_AUDIT_RATE', 0.01))
+SEARCH_LIMIT = 5
+# Milvus rejects a plain search whose offset + limit exceeds this; deeper pages go through the search iterator
+MAX_SEARCH_WINDOW = 16384
+SEARCH_MAX_K = int(os.environ.get('SEARCH_MAX_K', 1000))
+SEARCH_ITERATOR_BATCH_SIZE = int(os.environ.get('SEARCH_ITERATOR_BATCH_SIZE', 200))
+# Upper bound for the range searches that resume a cursor; any real L2 distance is below it
+SEARCH_RANGE_RADIUS = float(os.environ.get('SEARCH_RANGE_RADIUS', 1e30))
+FILE = 'csv/Questions Master _ ChildOther.csv'  # Update the file path separator to '/'
+COLLECTION_NAME = 'title_db'
+
+# Number of chunks sent to the embedding API in one request
+EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', 16))
+
+# Query embeddings never change for a given model; search results go stale after ingestion or the TTL
+embedding_cache = cache.LRUCache('embedding', int(os.environ.get('EMBEDDING_CACHE_SIZE', 10000)))
+result_cache = cache.LRUCache(
+    'result', int(os.environ.get('RESULT_CACHE_SIZE', 1000)), ttl=float(os.environ.get('RESULT_CACHE_TTL', 300))
+)
+
+# Embed a search query, reusing the embedding of an identical earlier query.
+# The API call is hedged and bounded by the request deadline; None means it could not be embedded in time.
+def embed_query(text, deadline=None):
+    embedding = embedding_cache.get(text)
+    if embedding is not None:
+        return embedding
+    deadline = deadline or resilience.Deadline()
     try:
-        embedding = openai.Embedding.create(
-            input=text, 
-            engine=os.environ.get('OPENAI_ENGINE')
-        )["data"][0]["embedding"]
-        return embedding  # Ensure this returns a list of numbers
+        embedding = resilience.call(
+            'openai_embedding',
+            lambda timeout: openai.Embedding.create(
+                input=text,
+                engine=os.environ.get('OPENAI_ENGINE'),
+                request_timeout=timeout
+            )["data"][0]["embedding"],
+            deadline
+        )
     except Exception as e:
         logger.error(f"Error embedding text: {text}. Error: {str(e)}")
         return None
+    embedding_cache.put(text, embedding)
+    return embedding
 
+# Embed a batch of texts in one API call, preserving input order
+def embed_batch_with_error_handling(texts):
+    try:
+        response = openai.Embedding.create(
+            input=texts,
+            engine=os.environ.get('OPENAI_ENGINE')
+        )
+        return [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+    except Exception as e:
+        logger.error(f"Error embedding batch of {len(texts)} texts. Error: {str(e)}")
+        return None
+
+
+# The vector collection only holds chunk ids, vectors and filter fields; text lives in doc_store
+def get_or_create_chunk_collection(collection_name):
+    if utility.has_collection(collection_name):
+        return Collection(name=collection_name)
+
+    fields = [
+        FieldSchema(name='id', dtype=DataType.INT64, description='Chunk ids in the document store', is_primary=True, auto_id=False),
+        FieldSchema(name='source', dtype=DataType.VARCHAR, description='Source file name', max_length=256),
+        FieldSchema(name='embedding', dtype=DataType.FLOAT_VECTOR, description='Embedding vectors', dim=DIMENSION)
+    ]
+    schema = CollectionSchema(fields=fields, description='Documentation chunks')
+    collection = Collection(name=collection_name, schema=schema)
+    index_params = {
+        'index_type': 'IVF_FLAT',
+        'metric_type': 'L2',
+        'params': {'nlist': 1024}
+    }
+    collection.create_index(field_name="embedding", index_params=index_params)
+    logger.info(f"Created collection '{collection_name}' and its index.")
+    return collection
+
+
+# Store one batch of chunks: text into the document store, ids + vectors into Milvus.
+# Returns the number of chunks inserted.
+def insert_chunk_batch(collection, collection_name, batch, job):
+    job.add(read=len(batch))
+    embeddings = embed_batch_with_error_handling([text for text, _ in batch])
+    if embeddings is None:
+        job.error(f"Could not embed {len(batch)} chunks.")
+        return 0
+    job.add(embedded=len(batch))
+    ids = doc_store.put_chunks(collection_name, batch)
+
+    # Rows are grouped by partition key so searches can target just the partitions they need
+    by_partition = {}
+    for chunk_id, (_, metadata), embedding in zip(ids, batch, embeddings):
+        rows = by_partition.setdefault(partition_manager.partition_for_metadata(metadata), ([], [], []))
+        rows[0].append(chunk_id)
+        rows[1].append(metadata['source'])
+        rows[2].append(embedding)
+    try:
+        for partition_name, rows in by_partition.items():
+            partition_manager.ensure_partition(collection, partition_name)
+            collection.insert(list(rows), partition_name=partition_name)
+    except Exception as e:
+        job.error(f"Error inserting {len(batch)} chunks into collection '{collection_name}'. Error: {str(e)}")
+        doc_store.delete_chunks(collection_name, ids)
+        return 0
+    job.add(inserted=len(batch))
+    logger.debug(f"Inserted {len(batch)} chunks into collection '{collection_name}'.")
 
-def save_to_milvus():
-    current_directory = os.getcwd()
-    FILE = 'csv/Questions Master _ ChildOther.csv'  # Update the file path separator to '/'
-    FilePath = os.path.join(current_directory, FILE)
-    COLLECTION_NAME = 'title_db'
-    DIMENSION = 1536
+    # Fold the batch into the routing summary now, so no embeddings are held for the rest of the job
+    collection_router.update_summary(collection_name, embeddings, OPENAI_ENGINE, DIMENSION)
+    return len(batch)
+
+
+# Runs as a background job (see jobs.py); called without one it runs inline and tracks progress locally
+def save_to_milvus(job=None, file=FILE, collection_name=COLLECTION_NAME):
+    job = job or jobs.Job('process_csv', collection_name)
+    FilePath = os.path.join(os.getcwd(), file)
 
     MILVUS_HOST = os.environ.get('MILVUS_HOST')
     MILVUS_PORT = os.environ.get('MILVUS_PORT')
@@ -76,35 +182,71 @@ def save_to_milvus():
     connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
     logger.info("Connected to Milvus.")
 
-    # Create collection schema and other setup steps...
-
-    # Insert each title and its embedding with error handling
-    collection = Collection(name=COLLECTION_NAME)  # Create collection object
-   # Assuming your Milvus collection expects three fields: 'id', 'title', 'embedding'
-    for idx, text in enumerate(csv_load(FilePath)):
-        logger.debug(f"Inserting text '{text}' with index '{idx}'.")
-        embedding = embed_with_error_handling(text)
-        if embedding is not None:
-            ins = [
-                {'id': idx, 'title': text[:198] if len(text) > 200 else text, 'embedding': embedding}
-            ]
-            try:
-                collection.insert(ins)
-                logger.debug(f"Text '{text}' inserted successfully.")
-                time.sleep(3)  # Free OpenAI account limited to 60 RPM
-            except Exception as e:
-                logger.error(f"Error inserting text '{text}' into collection. Error: {str(e)}")
+    collection = get_or_create_chunk_collection(collection_name)
+
+    # Records are counted without tokenizing; the chunk total for the ETA is extrapolated as the stream goes
+    records_total = chunking.count_records(FilePath)
+    keep_fields = (partition_manager.PARTITION_KEY,)
+
+    def update_total(metadata):
+        if records_total:
+            chunks_per_record = job.rows_read / (metadata['record'] + 1)
+            job.rows_total = max(job.rows_read, round(chunks_per_record * records_total))
+
+    # Chunks are streamed from the file and embedded in batches, so long documents are never truncated
+    inserted = 0
+    batch = []
+    try:
+        for chunk in chunking.iter_chunks(FilePath, keep_fields=keep_fields):
+            batch.append(chunk)
+            if len(batch) == EMBED_BATCH_SIZE:
+                job.check_cancelled()
+                inserted += insert_chunk_batch(collection, collection_name, batch, job)
+                update_total(batch[-1][1])
+                batch = []
+                job.sleep(3)  # Free OpenAI account limited to 60 RPM
+        if batch:
+            job.check_cancelled()
+            inserted += insert_chunk_batch(collection, collection_name, batch, job)
+        job.rows_total = job.rows_read
+    finally:
+        logger.info(f"Inserted {inserted} chunks from '{file}'.")
+
+        # Partitions are loaded on demand by partition_manager when they are first searched
+        result_cache.clear()
+
+    return {"message": "File processed and data inserted into the collection.", "inserted": inserted}
 
-    # Load the collection into memory for searching
-    collection.load()
-    logger.info("Loaded collection into memory for searching.")
 
-    return jsonify({"message": "File processed and data inserted into the collection."})
+# Cursors are opaque to clients: they carry the query and, per collection that still has hits,
+# where the last page ended (`after`: collection -> [last distance, ids at that distance]).
+# The next page resumes there with a range search instead of re-reading `offset` hits.
+def encode_cursor(search_term, k, offset, full_fan_out, partitions=None, after=None):
+    payload = json.dumps({'q': search_term, 'k': k, 'offset': offset, 'fan_out': full_fan_out, 'partitions': partitions,
+                          'after': after})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
 
 
-def search_in_milvus(search_term):
-        search_term = search_term
+def decode_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return (payload['q'], int(payload['k']), int(payload['offset']), bool(payload['fan_out']),
+                payload.get('partitions'), payload.get('after'))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {str(e)}")
+
+
+# Where a full page of rows ([id, distance, text], best first) ended. Ids tied at the last
+# distance are carried over so the next range search can exclude them.
+def page_position(rows, previous=None):
+    last = rows[-1][1]
+    ties = [row[0] for row in rows if row[1] == last]
+    if previous and previous[0] == last:
+        ties = list(previous[1]) + ties
+    return [last, ties]
+
 
+def route_search(search_term, full_fan_out=False, deadline=None, allow_audit=True):
         MILVUS_HOST = os.environ.get('MILVUS_HOST')
         MILVUS_PORT = os.environ.get('MILVUS_PORT')
 
@@ -115,48 +257,308 @@ def search_in_milvus(search_term):
         # Fetch all collections
         collections = utility.list_collections()
 
-        logger.info("Collections in Milvus:")
+        # Embed the query once and reuse it for routing and for every collection searched
+        embedded_text = embed_query(search_term, deadline)
+        if not embedded_text:
+            # Without an embedding nothing can be routed; callers fall back across every collection
+            return None, collections, {}, False
+
+        selected, scores = collection_router.route(
+            embedded_text, collections, OPENAI_ENGINE, DIMENSION, full_fan_out=full_fan_out
+        )
+        # An audited query is also searched in the other collections so the routing decision can be scored.
+        # Those extra searches only touch partitions that are already loaded (see search_in_milvus).
+        audit = allow_audit and not full_fan_out and random.random() < ROUTER_AUDIT_RATE
+        if audit:
+            metrics.increment('router.audited_queries')
+        return embedded_text, selected, scores, audit
+
+
+# `after` comes from a cursor: only the collections in it are searched, each resuming where its last page ended
+def search_in_milvus(search_term, full_fan_out=False, k=SEARCH_LIMIT, offset=0, partitions=None, deadline=None,
+                     after=None):
+        cache_key = (search_term, full_fan_out, k, offset, tuple(partitions) if partitions else None,
+                     json.dumps(after, sort_keys=True) if after is not None else None)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        deadline = deadline or resilience.Deadline()
+        embedded_text, selected, scores, audit = route_search(search_term, full_fan_out, deadline, after is None)
+        if embedded_text is None:
+            return degraded_search(cache_key, search_term, selected, k, offset)
+        if after is not None:
+            # Later pages only continue collections that still had hits
+            selected = [name for name in selected if name in after]
+        routed = list(scores) if audit else selected
+
         search_results_per_collection = {}
+        degraded = {}
+        next_after = {}
 
-        for collection_name in collections:
+        for collection_name in routed:
             logger.info(f'collection_name: {collection_name}')
 
-            # Search text in each collection
-            search_results = search_in_collection(collection_name, search_term)
+            # Search text in each collection; audit-only collections never load partitions for the audit
+            previous = after.get(collection_name) if after else None
+            search_results = search_in_collection(
+                collection_name, search_term, embedded_text, k, offset, partitions, deadline, degraded,
+                resident_only=collection_name not in selected, after=previous
+            )
 
             # Store search results for this collection
             search_results_per_collection[collection_name] = search_results
+            rows = search_results.get(search_term, [])
+            if collection_name in selected and len(rows) == k and collection_name not in degraded:
+                next_after[collection_name] = page_position(rows, previous)
+
+        if audit:
+            collection_router.record_precision(selected, search_results_per_collection, k)
+            search_results_per_collection = {
+                name: results for name, results in search_results_per_collection.items() if name in selected
+            }
+            degraded = {name: mode for name, mode in degraded.items() if name in selected}
+
+        response = {"results": search_results_per_collection, "routing": {"searched": selected, "scores": scores}}
+        response["next_cursor"] = (
+            encode_cursor(search_term, k, offset + k, full_fan_out, partitions, next_after) if next_after else None
+        )
+        if degraded:
+            response["degraded"] = degraded
+        else:
+            result_cache.put(cache_key, response)
+        return response
+
+
+# Used when the query cannot be embedded: serve the last known result for it, even if expired,
+# otherwise rank the document store's text lexically
+def degraded_search(cache_key, search_term, collections, k, offset):
+        stale = result_cache.get(cache_key, allow_stale=True)
+        if stale is not None:
+            metrics.increment('search.fallback.cached')
+            return dict(stale, degraded={name: 'cached' for name in stale["results"]})
+
+        metrics.increment('search.fallback.lexical')
+        search_results_per_collection = {}
+        for collection_name in collections:
+            rows = lexical_fallback(collection_name, search_term, k, offset)
+            search_results_per_collection[collection_name] = {search_term: rows} if rows else {}
+        return {
+            "results": search_results_per_collection,
+            "degraded": {name: 'lexical' for name in collections},
+            "next_cursor": None,
+        }
 
-        return jsonify({"results": search_results_per_collection})
-    
-def search_in_collection(collection_name, search_term):
-    # Get the collection object
+
+def lexical_fallback(collection_name, search_term, k=SEARCH_LIMIT, offset=0):
+    rows = doc_store.search_text(collection_name, search_term, offset + k)[offset:]
+    return [[chunk_id, score, text] for chunk_id, score, text in rows]
+
+
+# Same search as search_in_milvus, but yields one record per hit as each collection answers,
+# so the first results reach the client before the slowest collection has finished
+def stream_search_in_milvus(search_term, full_fan_out=False, k=SEARCH_LIMIT, offset=0, partitions=None, deadline=None,
+                            after=None):
+        deadline = deadline or resilience.Deadline()
+        embedded_text, selected, scores, _ = route_search(search_term, full_fan_out, deadline, allow_audit=False)
+        if after is not None:
+            selected = [name for name in selected if name in after]
+        if embedded_text is None:
+            # Degrade to the document store's lexical ranking rather than returning nothing
+            for collection_name in selected:
+                for hit_id, score, title in lexical_fallback(collection_name, search_term, k, offset):
+                    yield {"collection": collection_name, "id": hit_id, "score": score, "title": title,
+                           "degraded": "lexical"}
+            yield {"done": True, "next_cursor": None}
+            return
+
+        yield {"routing": {"searched": selected, "scores": scores}}
+        next_after = {}
+        for collection_name in selected:
+            previous = after.get(collection_name) if after else None
+            # Only the tail of the page at the last distance is kept, which is all page_position needs
+            tail = []
+            returned = 0
+            try:
+                for batch in iter_collection_hits(
+                    collection_name, search_term, embedded_text, k, offset, partitions, deadline, after=previous
+                ):
+                    for hit_id, score, title in batch:
+                        yield {"collection": collection_name, "id": hit_id, "score": score, "title": title}
+                        if tail and tail[-1][1] != score:
+                            tail = []
+                        tail.append([hit_id, score])
+                    returned += len(batch)
+            except (resilience.CircuitOpen, resilience.DeadlineExceeded) as e:
+                logger.warning(f"Falling back to lexical search in '{collection_name}'. Error: {str(e)}")
+                metrics.increment('search.fallback.lexical')
+                for hit_id, score, title in lexical_fallback(collection_name, search_term, k, offset):
+                    yield {"collection": collection_name, "id": hit_id, "score": score, "title": title,
+                           "degraded": "lexical"}
+                continue
+            if returned == k:
+                next_after[collection_name] = page_position(tail, previous)
+
+        next_cursor = encode_cursor(search_term, k, offset + k, full_fan_out, partitions, next_after) if next_after else None
+        yield {"done": True, "next_cursor": next_cursor}
+
+
+# Yield hits for one page (offset, offset + k) of a collection in batches.
+# Shallow pages use a single search call; deep pages walk Milvus' search iterator
+# so neither Milvus nor this process has to materialise offset + k hits at once.
+# resident_only restricts the search to partitions that are already loaded. `after` ([distance, ids])
+# resumes after a previous page with a range search, so a cursor page costs the same at any depth.
+def iter_collection_hits(collection_name, search_term, embedded_text, k=SEARCH_LIMIT, offset=0, partitions=None,
+                         deadline=None, resident_only=False, after=None):
+    deadline = deadline or resilience.Deadline()
     collection = Collection(collection_name)
+    # `partitions` holds partition key values (e.g. sub-categories); None searches every partition
+    requested = [partition_manager.partition_name_for(value) for value in partitions] if partitions else None
+    partition_names = partition_manager.resolve_partitions(collection, requested)
+    if resident_only:
+        resident = set(partition_manager.resident_partitions(collection_name))
+        partition_names = [name for name in partition_names if name in resident]
+    if not partition_names:
+        return
+    search_params = {"metric_type": "L2"}
+    # Older collections still carry their text in a 'title' field; chunk collections are hydrated from doc_store
+    output_fields = ['title'] if any(field.name == 'title' for field in collection.schema.fields) else []
+
+    def to_rows(hits):
+        hits = list(hits)
+        if output_fields:
+            return [[hit.id, hit.score, hit.entity.get('title')] for hit in hits]
+        chunks = doc_store.get_chunks(collection_name, [hit.id for hit in hits])
+        return [[hit.id, hit.score, chunks.get(hit.id, {}).get('text')] for hit in hits]
 
-    def search_with_error_handling(text):
+    try:
+        # Pinned so a concurrent search cannot release them while this one is reading
+        with partition_manager.loaded(collection, partition_names):
+            if after is not None:
+                last_distance, seen_ids = after
+                primary = next(field.name for field in collection.schema.fields if field.is_primary)
+                with metrics.timer('search.collection_ms'):
+                    results = resilience.call(
+                        'milvus_search',
+                        lambda timeout: collection.search(
+                            data=[embedded_text],
+                            anns_field="embedding",
+                            # L2 range search returns range_filter <= distance < radius
+                            param=dict(search_params, params={'radius': SEARCH_RANGE_RADIUS,
+                                                              'range_filter': last_distance}),
+                            limit=k,
+                            expr=f"{primary} not in {json.dumps(seen_ids)}" if seen_ids else None,
+                            partition_names=partition_names,
+                            output_fields=output_fields,
+                            timeout=timeout
+                        ),
+                        deadline
+                    )
+                metrics.increment('search.cursor_pages')
+                yield to_rows(results[0])
+                return
+
+            if offset + k <= MAX_SEARCH_WINDOW:
+                with metrics.timer('search.collection_ms'):
+                    results = resilience.call(
+                        'milvus_search',
+                        lambda timeout: collection.search(
+                            data=[embedded_text],
+                            anns_field="embedding",
+                            param=dict(search_params, offset=offset),
+                            limit=k,
+                            partition_names=partition_names,
+                            output_fields=output_fields,
+                            timeout=timeout
+                        ),
+                        deadline
+                    )
+                yield to_rows(results[0])
+                return
+
+            metrics.increment('search.iterator_pages')
+            iterator = collection.search_iterator(
+                data=[embedded_text],
+                anns_field="embedding",
+                param=search_params,
+                batch_size=SEARCH_ITERATOR_BATCH_SIZE,
+                limit=offset + k,
+                partition_names=partition_names,
+                output_fields=output_fields,
+                timeout=deadline.remaining()
+            )
+            skipped = 0
+            try:
+                while True:
+                    # Deep pages are not hedged, but they still stop at the deadline
+                    if deadline.expired():
+                        metrics.increment('milvus_search.deadline_exceeded')
+                        raise resilience.DeadlineExceeded(f"Deep search in '{collection_name}' ran out of time.")
+                    page = iterator.next()
+                    if len(page) == 0:
+                        break
+                    hits = []
+                    for hit in page:
+                        if skipped < offset:
+                            skipped += 1
+                            continue
+                        hits.append(hit)
+                    if hits:
+                        yield to_rows(hits)
+            finally:
+                iterator.close()
+    except (resilience.CircuitOpen, resilience.DeadlineExceeded):
+        raise
+    except Exception as e:
+        logger.error(f"Error searching for text '{search_term}' in collection '{collection_name}'. Error: {str(e)}")
+
+
+# Collections answered from the lexical fallback are recorded in `degraded`
+def search_in_collection(collection_name, search_term, embedded_text=None, k=SEARCH_LIMIT, offset=0, partitions=None,
+                         deadline=None, degraded=None, resident_only=False, after=None):
+    logger.debug(f"Searching for text '{search_term}' in collection '{collection_name}'.")
+    deadline = deadline or resilience.Deadline()
+    embedding = embedded_text or embed_query(search_term, deadline)
+    if not embedding:
+        return {}
+
+    search_results = []
+    try:
+        for batch in iter_collection_hits(collection_name, search_term, embedding, k, offset, partitions, deadline,
+                                          resident_only, after):
+            search_results.extend(batch)
+    except (resilience.CircuitOpen, resilience.DeadlineExceeded) as e:
+        logger.warning(f"Falling back to lexical search in '{collection_name}'. Error: {str(e)}")
+        metrics.increment('search.fallback.lexical')
+        search_results = lexical_fallback(collection_name, search_term, k, offset)
+        if degraded is not None:
+            degraded[collection_name] = 'lexical'
+    return {search_term: search_results} if search_results else {}
+
+
+# Load every collection's partitions and replay the most frequent logged queries so the
+# embedding and result caches are warm before the instance takes traffic
+def prewarm(top_n):
+    MILVUS_HOST = os.environ.get('MILVUS_HOST')
+    MILVUS_PORT = os.environ.get('MILVUS_PORT')
+    connections.connect(host=MILVUS_HOST, port=MILVUS_PORT)
+
+    started = time.time()
+    loaded = []
+    for collection_name in utility.list_collections():
         try:
-            logger.debug(f"Searching for text '{text}' in collection '{collection_name}'.")
-            embedded_text = embed_with_error_handling(text)
-            if embedded_text:
-                search_params = {"metric_type": "L2"}
-                results = collection.search(
-                    data=[embedded_text],
-                    anns_field="embedding",
-                    param=search_params,
-                    limit=5,
-                    output_fields=['title']
-                )
-                ret = []
-                for hit in results[0]:
-                    row = [hit.id, hit.score, hit.entity.get('title')]
-                    ret.append(row)
-                return ret
-            else:
-                return []
+            collection = Collection(collection_name)
+            partition_manager.ensure_loaded(collection, partition_manager.resolve_partitions(collection))
+            loaded.append(collection_name)
         except Exception as e:
-            logger.error(f"Error searching for text '{text}' in collection '{collection_name}'. Error: {str(e)}")
-            return []
+            logger.error(f"Error loading collection '{collection_name}' during prewarm. Error: {str(e)}")
 
-    # Perform searches using only the provided search term
-    search_results = search_with_error_handling(search_term)
-    return {search_term: search_results} if search_results else {}
+    warmed = 0
+    for search_term, k, partitions, full_fan_out in query_log.top_queries(top_n):
+        k = min(k or SEARCH_LIMIT, SEARCH_MAX_K)
+        search_in_milvus(search_term, full_fan_out, k, 0, list(partitions) if partitions else None)
+        warmed += 1
+
+    summary = {"collections": loaded, "queries": warmed, "seconds": round(time.time() - started, 2)}
+    logger.info(f"Prewarm finished: {summary}")
+    return summary
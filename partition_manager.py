@@ -0,0 +1,219 @@
+# partition_manager.py
+#
+# Places ingested rows into partitions by a configured key and keeps only the
+# recently searched partitions loaded in Milvus, releasing the least recently
+# used ones when the estimated memory budget would be exceeded.
+
+import collections
+import contextlib
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+
+from pymilvus import Partition, utility
+from pymilvus.client.types import LoadState
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Metadata field used to pick a partition, e.g. 'source', 'question_category' or 'question_sub_category'
+PARTITION_KEY = os.environ.get('PARTITION_KEY', 'source')
+PARTITION_MEMORY_BUDGET_BYTES = int(float(os.environ.get('PARTITION_MEMORY_BUDGET_MB', 1024)) * 1024 * 1024)
+DEFAULT_PARTITION = '_default'
+MAX_EVENTS = 200
+
+# Guards the bookkeeping below only; Milvus calls are always made outside it
+_lock = threading.Lock()
+# (collection_name, partition_name) -> estimated resident bytes, least recently used first
+_resident = collections.OrderedDict()
+_events = collections.deque(maxlen=MAX_EVENTS)
+# (collection_name, partition_name) -> number of searches currently using it; pinned partitions are never released
+_pins = collections.Counter()
+# (collection_name, partition_name) -> Event set once a load or release of that partition has finished
+_transitions = {}
+
+
+# Milvus partition names only allow letters, digits and underscores; a checksum keeps
+# values that differ only in punctuation apart
+def partition_name_for(value):
+    if value is None or value == '':
+        return DEFAULT_PARTITION
+    value = str(value)
+    slug = re.sub(r'[^0-9A-Za-z_]', '_', value)[:64]
+    return f"p_{slug}_{zlib.crc32(value.encode('utf-8')):08x}"
+
+
+def partition_for_metadata(metadata, key=PARTITION_KEY):
+    value = metadata.get(key)
+    if value is None:
+        value = metadata.get('fields', {}).get(key)
+    return partition_name_for(value)
+
+
+def ensure_partition(collection, partition_name):
+    if partition_name != DEFAULT_PARTITION and not collection.has_partition(partition_name):
+        collection.create_partition(partition_name)
+        logger.info(f"Created partition '{partition_name}' in collection '{collection.name}'.")
+
+
+def _estimate_bytes(collection, partition_name):
+    dimension = next(
+        (field.params.get('dim', 0) for field in collection.schema.fields if field.dtype.name == 'FLOAT_VECTOR'), 0
+    )
+    # construct_only: a plain Partition(...) would create the partition if it no longer exists
+    return Partition(collection, partition_name, construct_only=True).num_entities * int(dimension) * 4
+
+
+def _record_event(action, collection_name, partition_name, size):
+    _events.append({
+        'time': time.time(),
+        'action': action,
+        'collection': collection_name,
+        'partition': partition_name,
+        'bytes': size,
+    })
+    metrics.increment(f'partitions.{action}')
+
+
+def _release(key, size):
+    collection_name, partition_name = key
+    try:
+        Partition(collection_name, partition_name, construct_only=True).release()
+    except Exception as e:
+        # The collection may have been dropped by another process; there is nothing left to release
+        logger.warning(f"Could not release partition '{partition_name}' of '{collection_name}'. Error: {str(e)}")
+        return
+    _record_event('release', collection_name, partition_name, size)
+    logger.info(f"Released partition '{partition_name}' of '{collection_name}' ({size} bytes).")
+
+
+# Resolve which partitions a search should touch; unknown names are dropped
+def resolve_partitions(collection, partition_names=None):
+    existing = [partition.name for partition in collection.partitions]
+    if not partition_names:
+        return existing
+    return [name for name in partition_names if name in existing]
+
+
+# Another process (main.py, snapshot.py import) may have dropped, recreated or released the
+# collection, so a cached entry is only trusted if Milvus still reports the partitions loaded
+def _still_loaded(collection, partition_names):
+    try:
+        return utility.load_state(collection.name, partition_names=partition_names) == LoadState.Loaded
+    except Exception as e:
+        logger.warning(f"Could not read load state of '{collection.name}'. Error: {str(e)}")
+        return False
+
+
+# Load the claimed partitions, first releasing cold ones to stay under the budget. Partitions
+# needed by this search, pinned by another one or in transition are never evicted, even if that
+# means going over the budget.
+def _load(collection, keys, claimed):
+    victims = []
+    try:
+        sizes = {key: _estimate_bytes(collection, key[1]) for key in claimed}
+        with _lock:
+            resident_bytes = sum(_resident.values())
+            for key in list(_resident):
+                if resident_bytes + sum(sizes.values()) <= PARTITION_MEMORY_BUDGET_BYTES:
+                    break
+                if key in keys or _pins[key] or key in _transitions:
+                    continue
+                size = _resident.pop(key)
+                resident_bytes -= size
+                victims.append((key, size))
+                _transitions[key] = threading.Event()
+        for key, size in victims:
+            _release(key, size)
+
+        collection.load(partition_names=[partition_name for _, partition_name in claimed])
+        with _lock:
+            for key in claimed:
+                _resident[key] = sizes[key]
+        for key in claimed:
+            _record_event('load', collection.name, key[1], sizes[key])
+        logger.info(f"Loaded partitions {[partition_name for _, partition_name in claimed]} of '{collection.name}'.")
+    finally:
+        with _lock:
+            for key in list(claimed) + [key for key, _ in victims]:
+                _transitions.pop(key).set()
+
+
+# Make sure the given partitions are loaded. The bookkeeping lock is only held briefly: the
+# load-state check, loads and releases run outside it, and a search only waits for partitions
+# that another request is loading or releasing right now. With pin=True the partitions are
+# pinned before the lock is dropped, so they cannot be released until unpinned.
+def ensure_loaded(collection, partition_names, pin=False):
+    keys = [(collection.name, partition_name) for partition_name in partition_names]
+    verified = False
+    loaded_here = 0
+    while True:
+        with _lock:
+            busy = [_transitions[key] for key in keys if key in _transitions]
+            cached = [key for key in keys if key in _resident]
+            claimed = []
+            if not busy and (verified or not cached):
+                claimed = [key for key in keys if key not in _resident]
+                if not claimed:
+                    for key in keys:
+                        _resident.move_to_end(key)
+                    if pin:
+                        _pins.update(keys)
+                    metrics.increment('partitions.hit', len(keys) - loaded_here)
+                    return
+                for key in claimed:
+                    _transitions[key] = threading.Event()
+
+        if busy:
+            for event in busy:
+                event.wait()
+        elif claimed:
+            _load(collection, keys, claimed)
+            loaded_here += len(claimed)
+            verified = True
+        else:
+            if not _still_loaded(collection, [partition_name for _, partition_name in cached]):
+                with _lock:
+                    for key in cached:
+                        _resident.pop(key, None)
+                metrics.increment('partitions.stale')
+            verified = True
+
+
+# Load the partitions and keep them pinned for the duration of a search
+@contextlib.contextmanager
+def loaded(collection, partition_names):
+    keys = [(collection.name, name) for name in partition_names]
+    ensure_loaded(collection, partition_names, pin=True)
+    try:
+        yield
+    finally:
+        with _lock:
+            _pins.subtract(keys)
+            for key in keys:
+                if _pins[key] <= 0:
+                    del _pins[key]
+
+
+# Partitions of a collection that are currently loaded by this process
+def resident_partitions(collection_name):
+    with _lock:
+        return [partition_name for name, partition_name in _resident if name == collection_name]
+
+
+def residency():
+    with _lock:
+        resident = [
+            {'collection': collection_name, 'partition': partition_name, 'bytes': size}
+            for (collection_name, partition_name), size in reversed(_resident.items())
+        ]
+        return {
+            'budget_bytes': PARTITION_MEMORY_BUDGET_BYTES,
+            'resident_bytes': sum(_resident.values()),
+            'resident': resident,
+            'events': list(_events),
+        }
@@ -0,0 +1,83 @@
+# query_log.py
+#
+# Append-only JSON-lines log of /search requests. It feeds replay.py (load
+# testing against a running instance) and the startup prewarm, which replays
+# the most frequent queries before the instance reports ready.
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_PATH = os.environ.get('QUERY_LOG_PATH', 'query_log.jsonl')
+# plain: store the normalized query text; hash: store only a SHA-256 of it; off: log nothing
+QUERY_LOG_MODE = os.environ.get('QUERY_LOG_MODE', 'plain').lower()
+QUERY_LOG_MAX_BYTES = int(float(os.environ.get('QUERY_LOG_MAX_MB', 64)) * 1024 * 1024)
+
+_lock = threading.Lock()
+
+
+def normalize_query(text):
+    return ' '.join(text.lower().split())
+
+
+def _rotate_if_needed():
+    try:
+        if os.path.getsize(QUERY_LOG_PATH) >= QUERY_LOG_MAX_BYTES:
+            os.replace(QUERY_LOG_PATH, QUERY_LOG_PATH + '.1')
+    except FileNotFoundError:
+        pass
+
+
+def record(query, collections, k, offset=0, partitions=None, full_fan_out=False, latency_ms=None):
+    if QUERY_LOG_MODE == 'off' or not query:
+        return
+    normalized = normalize_query(query)
+    entry = {
+        'ts': round(time.time(), 3),
+        'query_hash': hashlib.sha256(normalized.encode('utf-8')).hexdigest(),
+        'collections': collections,
+        'k': k,
+        'offset': offset,
+        'filters': {'partitions': partitions, 'fan_out': full_fan_out},
+        'latency_ms': round(latency_ms, 2) if latency_ms is not None else None,
+    }
+    if QUERY_LOG_MODE == 'plain':
+        entry['query'] = normalized
+    line = json.dumps(entry, separators=(',', ':')) + '\n'
+    try:
+        with _lock:
+            _rotate_if_needed()
+            with open(QUERY_LOG_PATH, 'a', encoding='utf-8') as f:
+                f.write(line)
+    except OSError as e:
+        logger.error(f"Error writing query log '{QUERY_LOG_PATH}'. Error: {str(e)}")
+
+
+def iter_entries(path=QUERY_LOG_PATH):
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+# Most frequent replayable requests as (query, k, partitions, fan_out), most common first.
+# Entries logged in 'hash' mode carry no text and cannot be replayed.
+def top_queries(n, path=QUERY_LOG_PATH):
+    counts = collections.Counter()
+    for entry in iter_entries(path):
+        if 'query' not in entry or entry.get('offset'):
+            continue
+        filters = entry.get('filters') or {}
+        partitions = tuple(filters.get('partitions') or ()) or None
+        counts[(entry['query'], entry.get('k'), partitions, bool(filters.get('fan_out')))] += 1
+    return [key for key, _ in counts.most_common(n)]
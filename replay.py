@@ -0,0 +1,132 @@
+# replay.py
+#
+# Replays a query log captured by /search against a running instance and reports
+# throughput and latency. Example:
+#
+#   python replay.py --log query_log.jsonl --url http://127.0.0.1:5000 --speed 2 --concurrency 8
+
+import argparse
+import itertools
+import json
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import query_log
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def build_url(base_url, entry):
+    filters = entry.get('filters') or {}
+    params = [('q', entry['query']), ('k', entry.get('k') or 5), ('offset', entry.get('offset') or 0)]
+    params.extend(('partition', value) for value in filters.get('partitions') or [])
+    if filters.get('fan_out'):
+        params.append(('fan_out', 'all'))
+    return f"{base_url.rstrip('/')}/search?{urllib.parse.urlencode(params)}"
+
+
+def send(url, timeout):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            ok = 200 <= response.status < 300
+    except Exception:
+        ok = False
+    return ok, (time.perf_counter() - started) * 1000.0
+
+
+def replay(entries, base_url, speed, concurrency, timeout):
+    latencies = []
+    logged_latencies = []
+    errors = 0
+    skipped = 0
+    lock = threading.Lock()
+    # Keep at most `concurrency` requests queued behind the ones in flight, so long logs stream
+    slots = threading.BoundedSemaphore(concurrency * 2)
+
+    def run(entry):
+        nonlocal errors
+        try:
+            ok, latency_ms = send(build_url(base_url, entry), timeout)
+        finally:
+            slots.release()
+        with lock:
+            if ok:
+                latencies.append(latency_ms)
+                if entry.get('latency_ms') is not None:
+                    logged_latencies.append(entry['latency_ms'])
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    first_ts = None
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            if 'query' not in entry:
+                # Logged in 'hash' mode: there is no text to send
+                skipped += 1
+                continue
+            # speed 1 keeps the original inter-arrival times, 2 halves them, 0 sends as fast as possible
+            if speed > 0 and entry.get('ts') is not None:
+                first_ts = entry['ts'] if first_ts is None else first_ts
+                delay = (entry['ts'] - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            slots.acquire()
+            pool.submit(run, entry)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'skipped': skipped,
+        'seconds': round(elapsed, 3),
+        'throughput_qps': round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else None,
+        },
+        'logged_latency_ms': {
+            'p50': percentile(logged_latencies, 50),
+            'p95': percentile(logged_latencies, 95),
+            'p99': percentile(logged_latencies, 99),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a /search query log against a running instance.')
+    parser.add_argument('--log', default=query_log.QUERY_LOG_PATH, help='Query log to replay')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Base URL of the instance')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Replay speed relative to the original timing; 0 sends as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=4, help='Maximum requests in flight')
+    parser.add_argument('--limit', type=int, default=None, help='Replay at most this many entries')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--output', default=None, help='Also write the report to this JSON file')
+    args = parser.parse_args()
+
+    entries = query_log.iter_entries(args.log)
+    if args.limit is not None:
+        entries = itertools.islice(entries, args.limit)
+
+    report = replay(entries, args.url, args.speed, args.concurrency, args.timeout)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
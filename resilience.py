@@ -0,0 +1,187 @@
+# resilience.py
+#
+# Deadlines, hedged requests and circuit breakers for calls to OpenAI and Milvus.
+# A call that has not answered by a percentile of its own observed latency gets a
+# duplicate ("hedge") and the first answer wins; a dependency that keeps failing
+# is short-circuited so callers can degrade instead of waiting on it.
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEADLINE_MS = float(os.environ.get('SEARCH_DEADLINE_MS', 3000))
+# Smallest per-request deadline a caller may ask for
+MIN_SEARCH_DEADLINE_MS = float(os.environ.get('MIN_SEARCH_DEADLINE_MS', 100))
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 95))
+# Until this many latencies have been observed the hedge delay is HEDGE_DEFAULT_DELAY_MS
+HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', 20))
+HEDGE_DEFAULT_DELAY_MS = float(os.environ.get('HEDGE_DEFAULT_DELAY_MS', 500))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_SECONDS = float(os.environ.get('BREAKER_RESET_SECONDS', 30))
+# A call that ran out of time only counts against the dependency if it was given at least this long
+BREAKER_MIN_BUDGET_MS = float(os.environ.get('BREAKER_MIN_BUDGET_MS', 100))
+
+_pool = ThreadPoolExecutor(max_workers=int(os.environ.get('HEDGE_POOL_SIZE', 32)), thread_name_prefix='hedge')
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, timeout_ms=SEARCH_DEADLINE_MS):
+        self.expires_at = time.monotonic() + timeout_ms / 1000.0
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        if state != self.state:
+            logger.warning(f"Circuit '{self.name}' {self.state} -> {state}.")
+            metrics.increment(f'breaker.{self.name}.{state}')
+            self.state = state
+
+    # Closed lets everything through; open rejects until the reset period has passed,
+    # then a single half-open trial decides whether to close again
+    def allow(self):
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self._set_state('half_open')
+                return True
+            return self.state == 'closed'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._set_state('closed')
+
+    # Give back a half-open trial whose outcome says nothing about the dependency
+    def release(self):
+        with self._lock:
+            if self.state == 'half_open':
+                self.opened_at = time.monotonic() - self.reset_seconds
+                self.state = 'open'
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state('open')
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name):
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+def breaker_states():
+    with _breakers_lock:
+        return {name: item.state for name, item in _breakers.items()}
+
+
+def _hedge_delay(name):
+    series = f'{name}.latency_ms'
+    if metrics.sample_count(series) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY_MS / 1000.0
+    return metrics.percentile(series, HEDGE_PERCENTILE) / 1000.0
+
+
+# Run fn(timeout_seconds) within the deadline, sending one hedged duplicate if the first
+# attempt is slower than the observed latency percentile. The first successful answer wins.
+def hedged_call(name, fn, deadline):
+    # Nothing is sent once the caller's budget is gone
+    if deadline.expired():
+        metrics.increment(f'{name}.deadline_exceeded')
+        raise DeadlineExceeded(f"No time left to call '{name}'.")
+    started = time.monotonic()
+
+    def attempt():
+        attempt_started = time.monotonic()
+        result = fn(deadline.remaining())
+        metrics.observe(f'{name}.latency_ms', (time.monotonic() - attempt_started) * 1000.0)
+        return result
+
+    primary = _pool.submit(attempt)
+    pending = {primary}
+    done, _ = wait(pending, timeout=min(_hedge_delay(name), deadline.remaining()))
+    if not done and not deadline.expired():
+        metrics.increment(f'{name}.hedges')
+        pending.add(_pool.submit(attempt))
+
+    error = None
+    while pending:
+        done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+            winner_ms = (time.monotonic() - started) * 1000.0
+            if future is not primary:
+                metrics.increment(f'{name}.hedges_won')
+                # Once the slow primary finishes, record how much tail latency the hedge saved
+                primary.add_done_callback(
+                    lambda _: metrics.observe(f'{name}.hedge_saved_ms',
+                                              (time.monotonic() - started) * 1000.0 - winner_ms)
+                )
+            return future.result()
+
+    if error is not None:
+        raise error
+    metrics.increment(f'{name}.deadline_exceeded')
+    raise DeadlineExceeded(f"'{name}' did not answer within the deadline.")
+
+
+# Hedged call guarded by the dependency's circuit breaker. Running out of a budget that was
+# too small to begin with is the caller's problem, so it does not count as a dependency failure.
+def call(name, fn, deadline):
+    if deadline.expired():
+        metrics.increment(f'{name}.deadline_exceeded')
+        raise DeadlineExceeded(f"No time left to call '{name}'.")
+    circuit = breaker(name)
+    if not circuit.allow():
+        metrics.increment(f'{name}.short_circuited')
+        raise CircuitOpen(f"Circuit for '{name}' is open.")
+    budget_ms = deadline.remaining() * 1000.0
+    try:
+        result = hedged_call(name, fn, deadline)
+    except Exception:
+        if budget_ms >= BREAKER_MIN_BUDGET_MS or not deadline.expired():
+            circuit.record_failure()
+        else:
+            circuit.release()
+        raise
+    circuit.record_success()
+    return result
@@ -0,0 +1,275 @@
+# schema_inference.py
+#
+# Infers a typed Milvus schema for a CSV file in one streaming pass, then coerces
+# rows into typed columns in bulk during ingestion. Every column gets the
+# narrowest type that fits what was seen (BOOL, INT8..INT64, FLOAT, JSON or a
+# right-sized VARCHAR) and the vector dimension comes from the embedding model.
+
+import csv
+import json
+import logging
+import os
+import re
+
+from pymilvus import FieldSchema, CollectionSchema, DataType
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBEDDING_MODEL = 'text-embedding-ada-002'
+EMBEDDING_DIMENSIONS = {
+    'text-embedding-ada-002': 1536,
+    'text-embedding-3-small': 1536,
+    'text-embedding-3-large': 3072,
+}
+# 0 scans the whole file; otherwise only the first N rows are used to pick types
+SCHEMA_SAMPLE_ROWS = int(os.environ.get('SCHEMA_SAMPLE_ROWS', 0))
+MAX_VARCHAR_LENGTH = 65535
+MIN_VARCHAR_LENGTH = 64
+# Milvus stores VARCHAR values at their actual length, so max_length is only a cap. Later appends
+# are checked against it, so it gets generous headroom over the longest value sampled.
+VARCHAR_HEADROOM = float(os.environ.get('VARCHAR_HEADROOM', 4))
+# Field names taken by the collection itself, never given to a CSV column
+RESERVED_FIELD_NAMES = {'embedding'}
+# Rejected values listed in an ingestion report; the total is always counted
+MAX_REPORTED_REJECTIONS = int(os.environ.get('MAX_REPORTED_REJECTIONS', 100))
+
+_TRUE = {'1', 'true', 'yes', 'y', 't'}
+_FALSE = {'0', 'false', 'no', 'n', 'f'}
+_INT_RANGES = [
+    (DataType.INT8, -2 ** 7, 2 ** 7 - 1),
+    (DataType.INT16, -2 ** 15, 2 ** 15 - 1),
+    (DataType.INT32, -2 ** 31, 2 ** 31 - 1),
+    (DataType.INT64, -2 ** 63, 2 ** 63 - 1),
+]
+_INT_TYPES = {dtype for dtype, _, _ in _INT_RANGES}
+# Identifiers (e.g. rca_id) are always INT64: they keep growing after the sample was taken,
+# and stay integers even when every sampled value happens to be 0 or 1
+_ID_RE = re.compile(r'(^|_)id$', re.IGNORECASE)
+# Values used for empty cells, since Milvus fields cannot be null
+_EMPTY_DEFAULTS = {DataType.BOOL: False, DataType.FLOAT: 0.0, DataType.JSON: [], DataType.VARCHAR: ''}
+
+
+# Vector dimension of the configured embedding model; EMBEDDING_DIM overrides it for unknown models
+def embedding_dimension(model=None):
+    if os.environ.get('EMBEDDING_DIM'):
+        return int(os.environ['EMBEDDING_DIM'])
+    model = model or DEFAULT_EMBEDDING_MODEL
+    if model not in EMBEDDING_DIMENSIONS:
+        raise ValueError(f"Unknown embedding model '{model}'; set EMBEDDING_DIM to its vector dimension.")
+    return EMBEDDING_DIMENSIONS[model]
+
+
+# Milvus field names only allow letters, digits and underscores (e.g. 'question_response _type')
+def field_name_for(column):
+    name = re.sub(r'\W+', '_', column.strip())
+    return name if name and not name[0].isdigit() else f'f_{name}'
+
+
+def _parse_bool(value):
+    lowered = value.strip().lower()
+    if lowered in _TRUE:
+        return True
+    if lowered in _FALSE:
+        return False
+    raise ValueError('not a boolean')
+
+
+def _parse_json(value):
+    parsed = json.loads(value)
+    if not isinstance(parsed, (list, dict)):
+        raise ValueError('not a JSON array or object')
+    return parsed
+
+
+class _ColumnStats:
+    def __init__(self, column):
+        self.column = column
+        self.values = 0
+        self.empty = 0
+        self.bool_ok = True
+        self.int_ok = True
+        self.float_ok = True
+        self.json_ok = True
+        self.min_int = None
+        self.max_int = None
+        self.max_bytes = 0
+
+    def add(self, value):
+        if value is None or value.strip() == '':
+            self.empty += 1
+            return
+        self.values += 1
+        self.max_bytes = max(self.max_bytes, len(value.encode('utf-8')))
+        if self.bool_ok:
+            self.bool_ok = value.strip().lower() in _TRUE | _FALSE
+        if self.int_ok:
+            try:
+                number = int(value)
+                self.min_int = number if self.min_int is None else min(self.min_int, number)
+                self.max_int = number if self.max_int is None else max(self.max_int, number)
+            except ValueError:
+                self.int_ok = False
+        if self.float_ok and not self.int_ok:
+            try:
+                float(value)
+            except ValueError:
+                self.float_ok = False
+        if self.json_ok:
+            try:
+                _parse_json(value)
+            except ValueError:
+                self.json_ok = False
+
+
+def _varchar_length(max_bytes):
+    # Leave headroom for longer values than the ones sampled, rounded up to a power of two
+    length = MIN_VARCHAR_LENGTH
+    while length < max_bytes * VARCHAR_HEADROOM and length < MAX_VARCHAR_LENGTH:
+        length *= 2
+    return min(length, MAX_VARCHAR_LENGTH)
+
+
+def _decide(stats, is_primary):
+    decision = {'column': stats.column, 'name': field_name_for(stats.column), 'is_primary': is_primary,
+                'values': stats.values, 'empty': stats.empty}
+    if stats.values == 0:
+        decision.update(dtype=DataType.VARCHAR, max_length=MIN_VARCHAR_LENGTH, reason='no values seen')
+    elif is_primary:
+        if stats.int_ok:
+            decision.update(dtype=DataType.INT64, reason='integer primary key')
+        else:
+            decision.update(dtype=DataType.VARCHAR, max_length=_varchar_length(stats.max_bytes),
+                            reason='text primary key')
+    elif stats.bool_ok and not _ID_RE.search(stats.column):
+        decision.update(dtype=DataType.BOOL, reason='only boolean-like values')
+    elif stats.int_ok and _ID_RE.search(stats.column):
+        decision.update(dtype=DataType.INT64, reason='integer identifier')
+    elif stats.int_ok:
+        dtype = next(dtype for dtype, low, high in _INT_RANGES if low <= stats.min_int and stats.max_int <= high)
+        decision.update(dtype=dtype, reason=f'integers in [{stats.min_int}, {stats.max_int}]')
+    elif stats.float_ok:
+        decision.update(dtype=DataType.FLOAT, reason='numeric values')
+    elif stats.json_ok:
+        decision.update(dtype=DataType.JSON, reason='JSON arrays/objects')
+    else:
+        decision.update(dtype=DataType.VARCHAR, max_length=_varchar_length(stats.max_bytes),
+                        reason=f'text up to {stats.max_bytes} bytes')
+    return decision
+
+
+# Columns such as 'a b' and 'a_b' sanitize to the same field name, and a column may be called
+# 'embedding'; later ones get a numeric suffix. The original column is kept as the field
+# description, which is how plan_from_collection maps columns back to fields.
+def _dedupe_names(plan):
+    used = set(RESERVED_FIELD_NAMES)
+    for decision in plan:
+        base = name = decision['name']
+        suffix = 2
+        while name in used:
+            name = f'{base}_{suffix}'
+            suffix += 1
+        if name != base:
+            logger.warning(f"Column '{decision['column']}' is stored as field '{name}' because '{base}' is taken.")
+            decision['name'] = name
+        used.add(name)
+
+
+# Stream the file once and decide a type per column. Returns a plan: one decision dict per column.
+def infer_schema(path, primary_key='question_id', sample_rows=SCHEMA_SAMPLE_ROWS):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        stats = [_ColumnStats(column) for column in header]
+        for row_number, row in enumerate(reader):
+            if sample_rows and row_number >= sample_rows:
+                break
+            for column_stats, value in zip(stats, row):
+                column_stats.add(value)
+
+    plan = [_decide(column_stats, column_stats.column == primary_key) for column_stats in stats]
+    if not any(decision['is_primary'] for decision in plan):
+        raise ValueError(f"Primary key column '{primary_key}' not found in '{path}'.")
+    _dedupe_names(plan)
+    for decision in plan:
+        logger.info(f"Schema: {decision['column']} -> {decision['dtype'].name} ({decision['reason']})")
+    return plan
+
+
+# Rebuild a plan from an existing collection so new rows are coerced to the types it already has
+def plan_from_collection(collection, header):
+    fields = {field.name: field for field in collection.schema.fields if field.name not in RESERVED_FIELD_NAMES}
+    by_column = {field.description: field for field in fields.values()}
+    plan = []
+    for column in header:
+        field = by_column.get(column) or fields.get(field_name_for(column))
+        if field is None:
+            continue
+        plan.append({'column': column, 'name': field.name, 'is_primary': field.is_primary, 'dtype': field.dtype,
+                     'max_length': field.params.get('max_length'), 'reason': 'existing collection'})
+    return plan
+
+
+def build_collection_schema(plan, dimension, description='Dynamic Collection from CSV'):
+    fields = []
+    for decision in plan:
+        params = {'max_length': decision['max_length']} if decision['dtype'] == DataType.VARCHAR else {}
+        fields.append(FieldSchema(name=decision['name'], dtype=decision['dtype'], is_primary=decision['is_primary'],
+                                  description=decision['column'], **params))
+    fields.append(FieldSchema(name='embedding', dtype=DataType.FLOAT_VECTOR, dim=dimension))
+    return CollectionSchema(fields=fields, description=description)
+
+
+def _convert(value, decision):
+    dtype = decision['dtype']
+    if value is None or value.strip() == '':
+        if decision['is_primary']:
+            raise ValueError('empty primary key')
+        return _EMPTY_DEFAULTS.get(dtype, 0)
+    if dtype == DataType.BOOL:
+        return _parse_bool(value)
+    if dtype in _INT_TYPES:
+        number = int(value)
+        _, low, high = next(item for item in _INT_RANGES if item[0] == dtype)
+        if not low <= number <= high:
+            raise ValueError(f'out of range for {dtype.name}')
+        return number
+    if dtype in (DataType.FLOAT, DataType.DOUBLE):
+        return float(value)
+    if dtype == DataType.JSON:
+        return _parse_json(value)
+    if len(value.encode('utf-8')) > decision['max_length']:
+        raise ValueError(f"longer than max_length {decision['max_length']}")
+    return value
+
+
+# Convert a batch of csv.DictReader rows into typed columns keyed by field name.
+# Rows with a value that does not fit its column are dropped and reported instead of failing the insert.
+def coerce_rows(rows, plan, first_row_number=0):
+    columns = {decision['name']: [] for decision in plan}
+    accepted = []
+    rejected = []
+    for row_number, row in enumerate(rows, start=first_row_number):
+        converted = {}
+        try:
+            for decision in plan:
+                value = row.get(decision['column'])
+                try:
+                    converted[decision['name']] = _convert(value, decision)
+                except (ValueError, TypeError) as e:
+                    rejected.append({'row': row_number, 'column': decision['column'], 'value': value, 'error': str(e)})
+                    raise
+        except (ValueError, TypeError):
+            continue
+        for name, value in converted.items():
+            columns[name].append(value)
+        accepted.append(row)
+    return columns, accepted, rejected
+
+
+# JSON-friendly summary of the decisions, returned to API callers alongside rejected values
+def describe_plan(plan):
+    return [
+        {'column': decision['column'], 'field': decision['name'], 'type': decision['dtype'].name,
+         'max_length': decision.get('max_length'), 'reason': decision['reason']}
+        for decision in plan
+    ]
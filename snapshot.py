@@ -0,0 +1,359 @@
+# snapshot.py
+#
+# Export a populated collection to a versioned snapshot directory and import it
+# back without calling the embedding API:
+#
+#   vectors.npy     float32 vectors, row-aligned with scalars.parquet (np.load(..., mmap_mode='r'))
+#   scalars.parquet primary keys, scalar fields and the partition of every row
+#   documents.parquet chunk text from doc_store, when the collection keeps its text there
+#   manifest.json   format version, schema, index, embedding model, routing summary and checksums
+#
+#   python snapshot.py export title_db snapshots/title_db
+#   python snapshot.py import snapshots/title_db --collection title_db --drop-existing
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, Partition, utility
+from pymilvus.client.types import LoadState
+
+import collection_router
+import doc_store
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 'milvus-collection-snapshot'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_BATCH_SIZE = int(os.environ.get('SNAPSHOT_BATCH_SIZE', 5000))
+PARTITION_COLUMN = '_partition'
+
+VECTORS_FILE = 'vectors.npy'
+SCALARS_FILE = 'scalars.parquet'
+DOCUMENTS_FILE = 'documents.parquet'
+MANIFEST_FILE = 'manifest.json'
+# Space reserved for the vectors.npy header, which is filled in once the row count is known
+NPY_HEADER_BYTES = 128
+
+_ARROW_TYPES = {
+    DataType.BOOL: pa.bool_(),
+    DataType.INT8: pa.int8(),
+    DataType.INT16: pa.int16(),
+    DataType.INT32: pa.int32(),
+    DataType.INT64: pa.int64(),
+    DataType.FLOAT: pa.float32(),
+    DataType.DOUBLE: pa.float64(),
+    DataType.VARCHAR: pa.string(),
+    # JSON values are stored as their serialized text
+    DataType.JSON: pa.string(),
+}
+
+_DOCUMENTS_SCHEMA = pa.schema([
+    ('id', pa.int64()), ('source', pa.string()), ('text', pa.string()), ('metadata', pa.string()),
+])
+
+
+def _connect():
+    connections.connect(host=os.environ.get('MILVUS_HOST'), port=os.environ.get('MILVUS_PORT'))
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Version 1.0 .npy header for a (rows, dimension) little-endian float32 array, padded to NPY_HEADER_BYTES
+def _npy_header(rows, dimension):
+    header = repr({'descr': '<f4', 'fortran_order': False, 'shape': (rows, dimension)}).encode('latin1')
+    padding = NPY_HEADER_BYTES - len(np.lib.format.MAGIC_PREFIX) - 4 - len(header) - 1
+    return np.lib.format.MAGIC_PREFIX + bytes([1, 0]) + (len(header) + padding + 1).to_bytes(2, 'little') + \
+        header + b' ' * padding + b'\n'
+
+
+def _field_to_dict(field):
+    return {
+        'name': field.name,
+        'dtype': field.dtype.name,
+        'description': field.description,
+        'is_primary': field.is_primary,
+        'auto_id': field.auto_id,
+        'params': field.params,
+    }
+
+
+def _field_from_dict(spec):
+    return FieldSchema(
+        name=spec['name'],
+        dtype=DataType[spec['dtype']],
+        description=spec.get('description', ''),
+        is_primary=spec['is_primary'],
+        # Primary keys are written explicitly; chunk ids are moved to fresh doc_store ids on import
+        auto_id=False,
+        **spec.get('params', {})
+    )
+
+
+def export_collection(collection_name, snapshot_dir):
+    _connect()
+    collection = Collection(collection_name)
+    fields = collection.schema.fields
+    vector_field = next(field for field in fields if field.dtype == DataType.FLOAT_VECTOR)
+    scalar_fields = [field for field in fields if field.dtype != DataType.FLOAT_VECTOR]
+    dimension = int(vector_field.params['dim'])
+    primary = next(field.name for field in fields if field.is_primary)
+
+    partitions = [partition.name for partition in collection.partitions]
+    counts = {name: 0 for name in partitions}
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    started = time.time()
+    arrow_schema = pa.schema(
+        [(field.name, _ARROW_TYPES[field.dtype]) for field in scalar_fields] + [(PARTITION_COLUMN, pa.string())]
+    )
+    vectors = open(os.path.join(snapshot_dir, VECTORS_FILE), 'wb')
+    # The row count is only known at the end, so the .npy header is written last into reserved space
+    vectors.seek(NPY_HEADER_BYTES)
+    scalars = pq.ParquetWriter(os.path.join(snapshot_dir, SCALARS_FILE), arrow_schema, compression='zstd')
+    documents = None
+    row = 0
+    try:
+        for partition_name in partitions:
+            # One partition is loaded at a time; partitions already loaded (e.g. by the app) are left as they were
+            was_loaded = utility.load_state(collection_name, partition_names=[partition_name]) == LoadState.Loaded
+            if not was_loaded:
+                collection.load(partition_names=[partition_name])
+            iterator = collection.query_iterator(
+                batch_size=SNAPSHOT_BATCH_SIZE,
+                output_fields=[field.name for field in fields],
+                partition_names=[partition_name],
+            )
+            try:
+                while True:
+                    batch = iterator.next()
+                    if len(batch) == 0:
+                        break
+                    vectors.write(np.asarray(
+                        [entity[vector_field.name] for entity in batch], dtype='<f4'
+                    ).tobytes())
+                    columns = {}
+                    for field in scalar_fields:
+                        values = [entity[field.name] for entity in batch]
+                        if field.dtype == DataType.JSON:
+                            values = [json.dumps(value) for value in values]
+                        columns[field.name] = values
+                    columns[PARTITION_COLUMN] = [partition_name] * len(batch)
+                    scalars.write_table(pa.Table.from_pydict(columns, schema=arrow_schema))
+
+                    # Chunk text lives outside Milvus; carry it along so search results still hydrate
+                    chunks = doc_store.get_chunks(collection_name, [entity[primary] for entity in batch])
+                    if chunks:
+                        if documents is None:
+                            documents = pq.ParquetWriter(
+                                os.path.join(snapshot_dir, DOCUMENTS_FILE), _DOCUMENTS_SCHEMA, compression='zstd'
+                            )
+                        documents.write_table(pa.Table.from_pydict({
+                            'id': list(chunks),
+                            'source': [chunk['metadata'].get('source', '') for chunk in chunks.values()],
+                            'text': [chunk['text'] for chunk in chunks.values()],
+                            'metadata': [json.dumps(chunk['metadata']) for chunk in chunks.values()],
+                        }, schema=_DOCUMENTS_SCHEMA))
+                    row += len(batch)
+                    counts[partition_name] += len(batch)
+            finally:
+                iterator.close()
+                if not was_loaded:
+                    Partition(collection, partition_name, construct_only=True).release()
+        vectors.seek(0)
+        vectors.write(_npy_header(row, dimension))
+    finally:
+        scalars.close()
+        if documents is not None:
+            documents.close()
+        vectors.close()
+
+    files = [VECTORS_FILE, SCALARS_FILE] + ([DOCUMENTS_FILE] if documents is not None else [])
+    index = collection.indexes[0] if collection.indexes else None
+    summary = collection_router.load_summaries().get(collection_name)
+    manifest = {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'created_at': time.time(),
+        'collection': collection_name,
+        'description': collection.schema.description,
+        'fields': [_field_to_dict(field) for field in fields],
+        'vector_field': vector_field.name,
+        'dimension': dimension,
+        'rows': row,
+        'partitions': counts,
+        'index': {'field_name': index.field_name, 'params': index.params} if index else None,
+        'embedding_model': summary['model'] if summary else os.environ.get('OPENAI_ENGINE'),
+        'routing_summary': summary,
+        'checksums': {name: _sha256(os.path.join(snapshot_dir, name)) for name in files},
+    }
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(f"Exported {row} rows of '{collection_name}' to '{snapshot_dir}' in {time.time() - started:.1f}s.")
+    return manifest
+
+
+def _read_manifest(snapshot_dir):
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"'{snapshot_dir}' is not a collection snapshot.")
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {manifest.get('version')}.")
+    return manifest
+
+
+def verify_snapshot(snapshot_dir):
+    manifest = _read_manifest(snapshot_dir)
+    for name, expected in manifest['checksums'].items():
+        actual = _sha256(os.path.join(snapshot_dir, name))
+        if actual != expected:
+            raise ValueError(f"Checksum mismatch for '{name}': expected {expected}, got {actual}.")
+    return manifest
+
+
+# Smallest and largest primary key in the snapshot, read column-wise from the Parquet files
+def _id_range(snapshot_dir, primary):
+    low, high = None, None
+    for name, column in ((SCALARS_FILE, primary), (DOCUMENTS_FILE, 'id')):
+        path = os.path.join(snapshot_dir, name)
+        if not os.path.exists(path):
+            continue
+        bounds = pc.min_max(pq.read_table(path, columns=[column])[column]).as_py()
+        if bounds['min'] is None:
+            continue
+        low = bounds['min'] if low is None else min(low, bounds['min'])
+        high = bounds['max'] if high is None else max(high, bounds['max'])
+    return low, high
+
+
+def import_collection(snapshot_dir, collection_name=None, drop_existing=False):
+    manifest = verify_snapshot(snapshot_dir)
+    collection_name = collection_name or manifest['collection']
+    fields = [_field_from_dict(spec) for spec in manifest['fields']]
+    primary = next(field for field in fields if field.is_primary)
+    documents_path = os.path.join(snapshot_dir, DOCUMENTS_FILE)
+    has_documents = os.path.exists(documents_path)
+    if has_documents and primary.dtype != DataType.INT64:
+        raise ValueError(f"Snapshot keeps chunk text but its primary key '{primary.name}' is not INT64.")
+
+    _connect()
+    # Everything that can fail is checked before the existing collection is touched
+    if utility.has_collection(collection_name) and not drop_existing:
+        raise ValueError(f"Collection '{collection_name}' already exists; pass --drop-existing to replace it.")
+
+    # Chunk ids are only unique within the doc_store they were created in, so they get a fresh
+    # block here and the primary keys are shifted to match as the batches stream in
+    id_shift = 0
+    if has_documents:
+        low, high = _id_range(snapshot_dir, primary.name)
+        if low is not None:
+            id_shift = doc_store.reserve_ids(high - low + 1) - low
+
+    if utility.has_collection(collection_name):
+        utility.drop_collection(collection_name)
+        doc_store.delete_collection(collection_name)
+        logger.info(f"Dropped existing collection '{collection_name}'.")
+
+    started = time.time()
+    collection = Collection(name=collection_name, schema=CollectionSchema(fields=fields, description=manifest['description']))
+    for partition_name in manifest['partitions']:
+        if not collection.has_partition(partition_name):
+            collection.create_partition(partition_name)
+
+    # Restore chunk text first so the collection is searchable as soon as it is loaded
+    if has_documents:
+        for batch in pq.ParquetFile(documents_path).iter_batches(batch_size=SNAPSHOT_BATCH_SIZE):
+            columns = batch.to_pydict()
+            doc_store.restore_chunks(collection_name, zip(
+                [chunk_id + id_shift for chunk_id in columns['id']],
+                columns['source'], columns['text'], columns['metadata'],
+            ))
+
+    vectors = np.load(os.path.join(snapshot_dir, VECTORS_FILE), mmap_mode='r')
+    json_fields = {spec['name'] for spec in manifest['fields'] if spec['dtype'] == 'JSON'}
+    field_names = [field.name for field in fields]
+    row = 0
+    for batch in pq.ParquetFile(os.path.join(snapshot_dir, SCALARS_FILE)).iter_batches(batch_size=SNAPSHOT_BATCH_SIZE):
+        columns = batch.to_pydict()
+        columns[manifest['vector_field']] = vectors[row:row + batch.num_rows]
+        for name in json_fields:
+            columns[name] = [json.loads(value) for value in columns[name]]
+        if id_shift:
+            columns[primary.name] = [value + id_shift for value in columns[primary.name]]
+
+        # Rows are exported partition by partition, so each batch usually has a single partition
+        partition_column = columns.pop(PARTITION_COLUMN)
+        start = 0
+        while start < batch.num_rows:
+            end = start
+            while end < batch.num_rows and partition_column[end] == partition_column[start]:
+                end += 1
+            data = [
+                np.asarray(columns[name][start:end]) if name == manifest['vector_field'] else columns[name][start:end]
+                for name in field_names
+            ]
+            collection.insert(data, partition_name=partition_column[start])
+            start = end
+        row += batch.num_rows
+
+    if row != manifest['rows']:
+        raise RuntimeError(f"Snapshot declares {manifest['rows']} rows but {row} were imported.")
+
+    collection.flush()
+    if manifest['index']:
+        collection.create_index(field_name=manifest['index']['field_name'], index_params=manifest['index']['params'])
+    if manifest['routing_summary']:
+        collection_router.set_summary(collection_name, manifest['routing_summary'])
+
+    logger.info(f"Imported {row} rows into '{collection_name}' in {time.time() - started:.1f}s.")
+    return {'collection': collection_name, 'rows': row, 'seconds': round(time.time() - started, 2)}
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    parser = argparse.ArgumentParser(description='Export or import a Milvus collection snapshot.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help='Write a collection to a snapshot directory')
+    export_parser.add_argument('collection')
+    export_parser.add_argument('snapshot_dir')
+
+    import_parser = commands.add_parser('import', help='Create a collection from a snapshot directory')
+    import_parser.add_argument('snapshot_dir')
+    import_parser.add_argument('--collection', default=None, help='Target collection (defaults to the exported name)')
+    import_parser.add_argument('--drop-existing', action='store_true', help='Replace the collection if it exists')
+
+    verify_parser = commands.add_parser('verify', help='Check a snapshot against its checksums')
+    verify_parser.add_argument('snapshot_dir')
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        manifest = export_collection(args.collection, args.snapshot_dir)
+        print(json.dumps({'rows': manifest['rows'], 'checksums': manifest['checksums']}, indent=2))
+    elif args.command == 'import':
+        print(json.dumps(import_collection(args.snapshot_dir, args.collection, args.drop_existing), indent=2))
+    else:
+        manifest = verify_snapshot(args.snapshot_dir)
+        print(f"Snapshot of '{manifest['collection']}' with {manifest['rows']} rows is intact.")
+
+
+if __name__ == '__main__':
+    main()
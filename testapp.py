@@ -4,15 +4,23 @@ import random
 import os
 import pandas as pd
 import openai
-from pymilvus import connections, FieldSchema, CollectionSchema, DataType, Collection, utility
+from pymilvus import connections, Collection, utility
 import logging
 import colorlog
 from dotenv import load_dotenv
 import time
+import itertools
+
+import collection_router
+import jobs
+import schema_inference
 load_dotenv()
 
 app = Flask(__name__)
 
+EMBEDDING_MODEL = os.environ.get('OPENAI_ENGINE') or schema_inference.DEFAULT_EMBEDDING_MODEL
+INSERT_BATCH_SIZE = int(os.environ.get('INSERT_BATCH_SIZE', 100))
+
 # Set up the logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -136,6 +144,7 @@ def delete_collection():
     # Check if the collection exists
     if utility.has_collection(collection_name):
         utility.drop_collection(collection_name)
+        collection_router.drop_summary(collection_name)
         logger.info(f"Collection '{collection_name}' deleted successfully.")
         return jsonify({"message": f"Collection '{collection_name}' deleted successfully."}), 200
     else:
@@ -166,63 +175,61 @@ def handle_empty_values(value):
     else:
         return str(value) 
 
-def create_collection_schema(header):
-    fields = [
-        FieldSchema(
-            name=col_name,
-            dtype=DataType.INT64 if col_name == 'question_id' else DataType.VARCHAR,
-            is_primary=True if col_name == 'question_id' else False,
-            max_length=256 if col_name != 'question_id' else None
-        )
-        for col_name in header
-    ]
-    logger.info(f"fields:{fields}")
-    fields.append(FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=512))
-    return CollectionSchema(fields=fields, description="Dynamic Collection from CSV")
+def create_collection_schema(plan):
+    # Field types come from the inferred plan; the vector size from the configured embedding model
+    dimension = schema_inference.embedding_dimension(EMBEDDING_MODEL)
+    schema = schema_inference.build_collection_schema(plan, dimension)
+    logger.info(f"fields:{schema.fields}")
+    return schema
 
 
-
-def process_csv_data(file, collection):
+def process_csv_data(file, collection, plan, job):
     logger.info(f"Processing CSV data from file: {file}")
-    with open(file, newline='') as f:
-        logger.info(f"Opened file: {file}")
-        reader = csv.reader(f)
-        header = next(reader)
-        logger.info(f"Processing CSV data - header: {header}")
-        data_to_insert = []
-
-        for row in reader:
-            row_dict = {header[i]: row[i] for i in range(len(header))}
-            text = row_dict['question_id']
-            logger.info(f"Text to Embedding: {text}")
+    field_names = [field.name for field in collection.schema.fields]
+    dimension = schema_inference.embedding_dimension(EMBEDDING_MODEL)
+    report = {"inserted": 0, "rejected_total": 0, "rejected": []}
+    with open(file, newline='', encoding='utf-8-sig') as f:
+        job.rows_total = sum(1 for _ in csv.DictReader(f))
+
+    with open(file, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        row_number = 0
+        while True:
+            rows = list(itertools.islice(reader, INSERT_BATCH_SIZE))
+            if not rows:
+                break
+            job.check_cancelled()
+            job.add(read=len(rows))
+
+            # Coerce the whole batch to typed columns; rows that do not fit are reported, not inserted
+            columns, accepted, rejected = schema_inference.coerce_rows(rows, plan, row_number)
+            row_number += len(rows)
+            # Only the first few rejections are listed so the job status stays small
+            report["rejected_total"] += len(rejected)
+            room = schema_inference.MAX_REPORTED_REJECTIONS - len(report["rejected"])
+            report["rejected"].extend(rejected[:max(0, room)])
+            if not accepted:
+                continue
 
             try:
-                embedding_response = openai.Embedding.create(input=text, engine="text-embedding-ada-002")
-                logger.info(f"Embedding API Response: {embedding_response}")
-
-                if 'data' in embedding_response and embedding_response['data']:
-                    embedding = embedding_response['data'][0]['embedding']
-                    logger.info(f"Embedding: {embedding}")
-                    if isinstance(embedding, list) and len(embedding) > 0:
-                        row_dict['embedding'] = embedding
-                    else:
-                        logger.error("Invalid embedding data received.")
-                        row_dict['embedding'] = 'N/A'  # Set a default value if embedding creation fails
-                else:
-                    logger.error("No valid data received from the Embedding API.")
-                    row_dict['embedding'] = 'N/A'  # Set a default value if embedding creation fails
-
-            except Exception as embedding_error:
-                logger.error(f"Embedding creation error: {str(embedding_error)}")
-                row_dict['embedding'] = 'N/A'  # Set a default value if embedding creation fails
-
-            data_to_insert.append(row_dict)
-
-        try:
-            collection.insert(data_to_insert)
-            logger.info("Data inserted into collection successfully")
-        except Exception as insert_error:
-            logger.error(f"Data insertion error: {str(insert_error)}")
+                embedding_response = openai.Embedding.create(
+                    input=[row['question_id'] for row in accepted], engine=EMBEDDING_MODEL
+                )
+                data = sorted(embedding_response['data'], key=lambda item: item['index'])
+                columns['embedding'] = [item['embedding'] for item in data]
+                job.add(embedded=len(accepted))
+                collection.insert([columns[name] for name in field_names])
+                job.add(inserted=len(accepted))
+                report["inserted"] += len(accepted)
+                # Keep the routing summary in step so /search only fans out to relevant collections
+                collection_router.update_summary(collection.name, columns['embedding'], EMBEDDING_MODEL, dimension)
+                logger.info(f"Inserted {len(accepted)} rows into collection")
+            except Exception as insert_error:
+                job.error(f"Embedding or insertion error: {str(insert_error)}")
+
+    if report["rejected_total"]:
+        logger.warning(f"Rejected {report['rejected_total']} values that did not fit the schema")
+    return report
 
 
 @app.route('/create_and_store_data', methods=['POST'])
@@ -243,24 +250,42 @@ def create_and_store_data():
         logger.error(f"Milvus connection error: {str(milvus_conn_error)}")
         return jsonify({"error": f"Milvus connection error: {str(milvus_conn_error)}"}), 500
 
-    try:
+    # Schema inference, embedding and insertion run as a background job
+    def ingest(job):
         # List collections
         collections = utility.list_collections()
 
         if collection_name not in collections:
-            schema = create_collection_schema(pd.read_csv(file).columns)
+            plan = schema_inference.infer_schema(file)
+            schema = create_collection_schema(plan)
             collection = Collection(name=collection_name, schema=schema)
-            collection.create()
-            process_csv_data(file, collection)
-            return jsonify({"message": f"Collection '{collection_name}' created and data stored successfully."}), 201
+            message = f"Collection '{collection_name}' created and data stored successfully."
         else:
             collection = Collection(name=collection_name)
-            process_csv_data(file, collection)
-            return jsonify({"message": f"Collection '{collection_name}' already exists. Data inserted successfully."}), 200
-    except Exception as collection_error:
-        logger.error(f"Collection creation or insertion error: {str(collection_error)}")
-        return jsonify({"error": f"Collection creation or insertion error: {str(collection_error)}"}), 500
+            plan = schema_inference.plan_from_collection(collection, pd.read_csv(file, nrows=0).columns)
+            message = f"Collection '{collection_name}' already exists. Data inserted successfully."
+        report = process_csv_data(file, collection, plan, job)
+        return {"message": message, "schema": schema_inference.describe_plan(plan), **report}
+
+    job = jobs.submit('create_and_store_data', collection_name, ingest)
+    return jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"message": f"Job '{job_id}' does not exist."}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    # Cancellation takes effect at the next batch boundary
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"message": f"Job '{job_id}' does not exist."}), 404
+    return jsonify(job.to_dict()), 202
 
-    
 if __name__ == '__main__':
     app.run(debug=True)
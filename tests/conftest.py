@@ -0,0 +1,5 @@
+# The application modules live at the repository root rather than in a package
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
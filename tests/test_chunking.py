@@ -0,0 +1,61 @@
+import pytest
+
+import chunking
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # Whitespace words make token counts predictable whether or not tiktoken is installed
+    monkeypatch.setattr(chunking, '_encoding', None)
+
+
+def words(start, stop):
+    return [f'w{i}' for i in range(start, stop)]
+
+
+def test_short_text_is_one_chunk():
+    assert list(chunking.chunk_text('a b c', max_tokens=10, overlap=2)) == ['a b c']
+
+
+def test_empty_text_has_no_chunks():
+    assert list(chunking.chunk_text('', max_tokens=10, overlap=2)) == []
+
+
+def test_chunks_are_bounded_and_overlap():
+    chunks = list(chunking.chunk_text(' '.join(words(0, 25)), max_tokens=10, overlap=3))
+    assert [chunk.split() for chunk in chunks] == [words(0, 10), words(7, 17), words(14, 24), words(21, 25)]
+
+
+def test_overlap_must_be_smaller_than_chunk():
+    with pytest.raises(ValueError):
+        list(chunking.chunk_text('a b c', max_tokens=3, overlap=3))
+
+
+def test_csv_chunks_keep_only_requested_fields(tmp_path):
+    path = tmp_path / 'rows.csv'
+    path.write_text('category,question\nHealth,How are you?\nFamily,Who lives with you?\n', encoding='utf-8')
+    chunks = list(chunking.iter_chunks(str(path), keep_fields=('category',)))
+    assert [text for text, _ in chunks] == [
+        'category: Health\nquestion: How are you?',
+        'category: Family\nquestion: Who lives with you?',
+    ]
+    assert chunks[0][1] == {'row': 0, 'fields': {'category': 'Health'}, 'source': 'rows.csv', 'record': 0,
+                            'chunk_index': 0}
+    assert 'fields' not in list(chunking.iter_chunks(str(path)))[0][1]
+
+
+def test_count_records(tmp_path):
+    path = tmp_path / 'rows.csv'
+    path.write_text('a,b\n1,2\n3,4\n5,6\n', encoding='utf-8')
+    assert chunking.count_records(str(path)) == 3
+    text = tmp_path / 'notes.txt'
+    text.write_text('hello\n', encoding='utf-8')
+    assert chunking.count_records(str(text)) is None
+
+
+def test_markdown_splits_on_headings(tmp_path):
+    path = tmp_path / 'doc.md'
+    path.write_text('intro\n# First\none\n## Second\ntwo\n', encoding='utf-8')
+    records = list(chunking.iter_markdown_records(str(path)))
+    assert records == [('intro\n', {'heading': None}), ('# First\none\n', {'heading': 'First'}),
+                       ('## Second\ntwo\n', {'heading': 'Second'})]
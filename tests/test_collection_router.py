@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import collection_router
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def summary_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(collection_router, 'SUMMARY_PATH', str(tmp_path / 'summaries.json'))
+
+
+def cluster(center, count, seed):
+    rng = np.random.default_rng(seed)
+    return (np.asarray(center, dtype=np.float32) + rng.normal(scale=0.05, size=(count, len(center)))).tolist()
+
+
+def test_kmeans_keeps_weight_and_unit_centroids():
+    rng = np.random.default_rng(0)
+    vectors = collection_router._normalize(rng.normal(size=(50, 4)).astype(np.float32))
+    weights = np.arange(1, 51, dtype=np.float64)
+    centroids, sizes = collection_router._kmeans(vectors, weights, 8)
+    assert len(centroids) <= 8
+    assert sizes.sum() == pytest.approx(weights.sum())
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+
+
+def test_update_summary_merges_batches():
+    collection_router.update_summary('docs', cluster([1, 0, 0, 0], 30, 1), 'model', 4)
+    collection_router.update_summary('docs', cluster([0, 1, 0, 0], 30, 2), 'model', 4)
+    summary = collection_router.load_summaries()['docs']
+    assert summary['count'] == 60
+    assert len(summary['centroids']) <= collection_router.CODEBOOK_SIZE
+    assert sum(summary['sizes']) == pytest.approx(60)
+    # Both batches are still represented after the merge
+    scores = collection_router.score_collections([1, 0, 0, 0], ['docs'], 'model', 4)
+    assert scores['docs'] > 0.9
+    scores = collection_router.score_collections([0, 1, 0, 0], ['docs'], 'model', 4)
+    assert scores['docs'] > 0.9
+
+
+def test_route_skips_distant_collections():
+    collection_router.update_summary('near', cluster([1, 0, 0, 0], 20, 1), 'model', 4)
+    collection_router.update_summary('far', cluster([-1, 0, 0, 0], 20, 2), 'model', 4)
+    selected, scores = collection_router.route([1, 0, 0, 0], ['near', 'far', 'legacy'], 'model', 4, threshold=0.5)
+    # Collections without a summary cannot be ruled out
+    assert selected == ['legacy', 'near']
+    assert scores['legacy'] is None
+
+
+def test_route_keeps_the_best_match_below_threshold():
+    collection_router.update_summary('a', cluster([1, 0, 0, 0], 20, 1), 'model', 4)
+    collection_router.update_summary('b', cluster([0, 1, 0, 0], 20, 2), 'model', 4)
+    before = metrics.get_counter('router.below_threshold')
+    selected, _ = collection_router.route([0.6, 0.4, 0.7, 0], ['a', 'b'], 'model', 4, threshold=0.99)
+    assert selected == ['a']
+    assert metrics.get_counter('router.below_threshold') == before + 1
+
+
+def test_full_fan_out_and_model_mismatch():
+    collection_router.update_summary('a', cluster([1, 0, 0, 0], 20, 1), 'model', 4)
+    collection_router.update_summary('other_model', cluster([1, 0, 0, 0], 20, 1), 'other', 4)
+    selected, _ = collection_router.route([0, 0, 1, 0], ['a', 'other_model'], 'model', 4, full_fan_out=True)
+    assert selected == ['a']
+
+
+def test_scoring_sees_summary_changes():
+    collection_router.update_summary('a', cluster([1, 0, 0, 0], 20, 1), 'model', 4)
+    assert collection_router.score_collections([1, 0, 0, 0], ['a'], 'model', 4)['a'] is not None
+    collection_router.drop_summary('a')
+    assert collection_router.score_collections([1, 0, 0, 0], ['a'], 'model', 4)['a'] is None
+
+
+def test_record_precision():
+    results = {
+        'a': {'q': [[1, 0.1, 'x'], [2, 0.2, 'y']]},
+        'b': {'q': [[3, 0.15, 'z']]},
+        'c': {'q': [[4, 0.9, 'w']]},
+    }
+    assert collection_router.record_precision(['a', 'c'], results, k=3) == pytest.approx(0.5)
+    assert collection_router.record_precision([], results, k=3) is None
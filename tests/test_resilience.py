@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+import metrics
+import resilience
+
+
+@pytest.fixture(autouse=True)
+def fast_hedges(monkeypatch):
+    monkeypatch.setattr(resilience, 'HEDGE_DEFAULT_DELAY_MS', 20)
+    monkeypatch.setattr(resilience, 'HEDGE_MIN_SAMPLES', 10 ** 6)
+
+
+def test_deadline_counts_down():
+    deadline = resilience.Deadline(50)
+    assert 0 < deadline.remaining() <= 0.05
+    assert not deadline.expired()
+    assert resilience.Deadline(0).expired()
+
+
+def test_fast_call_is_not_hedged():
+    before = metrics.get_counter('fast.hedges')
+    assert resilience.hedged_call('fast', lambda timeout: 'ok', resilience.Deadline(1000)) == 'ok'
+    assert metrics.get_counter('fast.hedges') == before
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    calls = []
+    lock = threading.Lock()
+
+    def fn(timeout):
+        with lock:
+            calls.append(timeout)
+            first = len(calls) == 1
+        if first:
+            time.sleep(0.3)
+            return 'primary'
+        return 'hedge'
+
+    won_before = metrics.get_counter('slow.hedges_won')
+    assert resilience.hedged_call('slow', fn, resilience.Deadline(1000)) == 'hedge'
+    assert len(calls) == 2
+    assert metrics.get_counter('slow.hedges_won') == won_before + 1
+
+
+def test_no_answer_within_deadline_raises():
+    with pytest.raises(resilience.DeadlineExceeded):
+        resilience.hedged_call('stuck', lambda timeout: time.sleep(0.3), resilience.Deadline(50))
+
+
+def test_expired_deadline_sends_nothing():
+    calls = []
+    with pytest.raises(resilience.DeadlineExceeded):
+        resilience.hedged_call('late', lambda timeout: calls.append(timeout), resilience.Deadline(0))
+    assert calls == []
+
+
+def test_dependency_error_is_raised():
+    def fn(timeout):
+        raise IOError('down')
+
+    with pytest.raises(IOError):
+        resilience.hedged_call('broken', fn, resilience.Deadline(1000))
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = resilience.CircuitBreaker('unit', failure_threshold=2, reset_seconds=0.05)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # Only one trial is let through while half-open
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_failed_half_open_trial_reopens():
+    breaker = resilience.CircuitBreaker('unit', failure_threshold=5, reset_seconds=0.05)
+    for _ in range(5):
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+
+def test_released_half_open_trial_allows_the_next_one():
+    breaker = resilience.CircuitBreaker('unit', failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    breaker.opened_at -= 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == 'open'
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+
+
+def test_call_opens_the_breaker_on_dependency_errors():
+    def fn(timeout):
+        raise IOError('down')
+
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(IOError):
+            resilience.call('flaky_dependency', fn, resilience.Deadline(1000))
+    with pytest.raises(resilience.CircuitOpen):
+        resilience.call('flaky_dependency', lambda timeout: 'ok', resilience.Deadline(1000))
+
+
+def test_exhausted_deadlines_do_not_open_the_breaker():
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(resilience.DeadlineExceeded):
+            resilience.call('healthy_dependency', lambda timeout: 'ok', resilience.Deadline(0))
+    assert resilience.call('healthy_dependency', lambda timeout: 'ok', resilience.Deadline(1000)) == 'ok'
+    assert resilience.breaker('healthy_dependency').state == 'closed'
+
+
+def test_tiny_budgets_do_not_open_the_breaker(monkeypatch):
+    monkeypatch.setattr(resilience, 'BREAKER_MIN_BUDGET_MS', 100)
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(resilience.DeadlineExceeded):
+            resilience.call('tight_budget', lambda timeout: time.sleep(0.1), resilience.Deadline(5))
+    assert resilience.breaker('tight_budget').state == 'closed'
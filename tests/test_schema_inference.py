@@ -0,0 +1,113 @@
+import pytest
+from pymilvus import DataType
+
+import schema_inference
+
+
+def write_csv(tmp_path, text):
+    path = tmp_path / 'data.csv'
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def plan_by_column(plan):
+    return {decision['column']: decision for decision in plan}
+
+
+def test_infers_narrowest_types(tmp_path):
+    path = write_csv(tmp_path, (
+        'question_id,active,level,score,tags,question,note\n'
+        '1,true,3,0.5,"[1, 2]",How are you?,\n'
+        '2,no,-100,2,"{""a"": 1}",Where do you live?,x\n'
+    ))
+    plan = plan_by_column(schema_inference.infer_schema(path))
+    assert plan['question_id']['dtype'] == DataType.INT64
+    assert plan['question_id']['is_primary']
+    assert plan['active']['dtype'] == DataType.BOOL
+    assert plan['level']['dtype'] == DataType.INT8
+    assert plan['score']['dtype'] == DataType.FLOAT
+    assert plan['tags']['dtype'] == DataType.JSON
+    assert plan['question']['dtype'] == DataType.VARCHAR
+    assert plan['question']['max_length'] >= 4 * len('Where do you live?')
+    assert plan['note']['dtype'] == DataType.VARCHAR
+
+
+def test_identifier_columns_stay_int64(tmp_path):
+    path = write_csv(tmp_path, 'question_id,rca_id,impact_id\n1,11,0\n2,39,1\n')
+    plan = plan_by_column(schema_inference.infer_schema(path))
+    assert plan['rca_id']['dtype'] == DataType.INT64
+    assert plan['impact_id']['dtype'] == DataType.INT64
+
+
+def test_missing_primary_key_is_rejected(tmp_path):
+    path = write_csv(tmp_path, 'id,name\n1,a\n')
+    with pytest.raises(ValueError):
+        schema_inference.infer_schema(path)
+
+
+def test_colliding_names_get_suffixes(tmp_path):
+    path = write_csv(tmp_path, 'question_id,a b,a_b,embedding\n1,x,y,z\n')
+    names = [decision['name'] for decision in schema_inference.infer_schema(path)]
+    assert names == ['question_id', 'a_b', 'a_b_2', 'embedding_2']
+
+
+def test_field_names_are_sanitized():
+    assert schema_inference.field_name_for('question_response _type') == 'question_response__type'
+    assert schema_inference.field_name_for('1st') == 'f_1st'
+
+
+def test_varchar_length_has_headroom():
+    assert schema_inference._varchar_length(0) == schema_inference.MIN_VARCHAR_LENGTH
+    assert schema_inference._varchar_length(102) == 512
+    assert schema_inference._varchar_length(10 ** 6) == schema_inference.MAX_VARCHAR_LENGTH
+
+
+def test_coerce_rows_converts_and_rejects(tmp_path):
+    path = write_csv(tmp_path, 'question_id,active,level,tags\n1,true,3,[1]\n2,false,-4,[2]\n')
+    plan = schema_inference.infer_schema(path)
+    rows = [
+        {'question_id': '10', 'active': 'yes', 'level': '5', 'tags': '[3]'},
+        {'question_id': '11', 'active': 'maybe', 'level': '5', 'tags': '[]'},
+        {'question_id': '12', 'active': '', 'level': '1000', 'tags': '[]'},
+        {'question_id': '13', 'active': '', 'level': '', 'tags': ''},
+    ]
+    columns, accepted, rejected = schema_inference.coerce_rows(rows, plan, first_row_number=100)
+    assert columns['question_id'] == [10, 13]
+    assert columns['active'] == [True, False]
+    assert columns['level'] == [5, 0]
+    assert columns['tags'] == [[3], []]
+    assert len(accepted) == 2
+    assert [(item['row'], item['column']) for item in rejected] == [(101, 'active'), (102, 'level')]
+
+
+def test_empty_primary_key_is_rejected(tmp_path):
+    path = write_csv(tmp_path, 'question_id,name\n1,a\n')
+    plan = schema_inference.infer_schema(path)
+    _, accepted, rejected = schema_inference.coerce_rows([{'question_id': '', 'name': 'b'}], plan)
+    assert accepted == []
+    assert rejected[0]['column'] == 'question_id'
+
+
+def test_embedding_dimension(monkeypatch):
+    monkeypatch.delenv('EMBEDDING_DIM', raising=False)
+    assert schema_inference.embedding_dimension('text-embedding-ada-002') == 1536
+    assert schema_inference.embedding_dimension('text-embedding-3-large') == 3072
+    with pytest.raises(ValueError):
+        schema_inference.embedding_dimension('unknown-model')
+    monkeypatch.setenv('EMBEDDING_DIM', '8')
+    assert schema_inference.embedding_dimension('unknown-model') == 8
+
+
+def test_plan_from_collection_follows_descriptions(tmp_path):
+    path = write_csv(tmp_path, 'question_id,a b,a_b\n1,x,y\n')
+    schema = schema_inference.build_collection_schema(schema_inference.infer_schema(path), 8)
+
+    class FakeCollection:
+        pass
+
+    collection = FakeCollection()
+    collection.schema = schema
+    plan = schema_inference.plan_from_collection(collection, ['question_id', 'a b', 'a_b', 'unknown'])
+    assert [(decision['column'], decision['name']) for decision in plan] == [
+        ('question_id', 'question_id'), ('a b', 'a_b'), ('a_b', 'a_b_2'),
+    ]